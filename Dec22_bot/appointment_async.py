@@ -0,0 +1,365 @@
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+import asyncio
+from functools import partial
+
+import appointment_html_optimized as base
+from appointment_store import AppointmentStore
+from browser_profile import PROFILES, RequestStats, launch_browser, new_context_async
+from calendar_capture import (CalendarCapture, REQUIRED_FIELDS, find_card, is_arrived, modal_matches,
+                              rows_from_payloads)
+from calendar_scroll import INSTALL_JS, QUIET_JS, STEP_JS
+from card_snapshot import SNAPSHOT_JS, card_fingerprint
+from checkpoint import FINGERPRINT_KEY, Checkpoint
+from detail_extract import MODAL_JS, modal_fields
+from run_metrics import STAGE_LOG, stage, stream_metrics, write_report
+from seen_cards import SeenCards
+from session import LOGIN_FORM_SELECTOR, MENU_SELECTOR, saved_state
+from waits import CALENDAR_CONTAINER, MODAL_SELECTOR, WAIT_LOG, timed_wait, print_wait_summary
+from worker_pool import MAX_WORKERS, shard_cards
+
+# ---------------- asyncio 版 ----------------
+# 和 appointment_html_optimized.py 相同的命令行参数、相同的输出列，但整条流水线是 asyncio 任务：
+#   浏览器任务：点卡片 → 一次 evaluate 取回弹窗文字 → Escape，马上去点下一张
+#   解析任务：  把弹窗取回的头部和键值对整理成字段（detail_extract.modal_fields）
+#   写入任务：  查重 + 单行写入预约库（SQLite，在线程里提交），结束时导出 Excel
+# 浏览器在等下一个弹窗的时候，上一张卡片的解析和写入同时在做。
+# --workers N 时在同一个浏览器里开 N 个 context 并发，共用一个写入任务。
+
+BLUE_CARD_SELECTOR = "div.appointment-block-container.blue"
+CARD_SELECTOR = "div.appointment-block-container"
+
+_DONE = object()
+
+# ---------------- 页面行为（异步版） ----------------
+
+@stage()
+async def login(page):
+    print("正在登录...")
+    try:
+        await page.goto(base.URL, wait_until="domcontentloaded", timeout=30000)
+    except Exception as e:
+        print(f"⚠️ 首次连接超时，正在重试... ({e})")
+        await page.goto(base.URL, wait_until="domcontentloaded", timeout=30000)
+
+    try:
+        await page.locator("input[type='text']").nth(0).fill(base.COMPANY)
+        await page.locator("input[type='text']").nth(1).fill(base.USERNAME)
+        await page.locator("input[type='password']").fill(base.PASSWORD)
+        await page.get_by_role("button", name="登 录").click()
+
+        with timed_wait("login"):
+            await page.wait_for_selector(MENU_SELECTOR, timeout=30000)
+        print("登录成功。")
+    except Exception as e:
+        print(f"登录过程出错: {e}")
+
+async def start_session(page, force_login=False):
+    """和 session.start_session 相同：能复用保存的登录状态就不重新登录"""
+    if not force_login and saved_state(base.SESSION_PATH):
+        try:
+            await page.goto(base.URL, wait_until="domcontentloaded", timeout=30000)
+            with timed_wait("session_check"):
+                target = page.locator(MENU_SELECTOR).or_(page.locator(LOGIN_FORM_SELECTOR))
+                await target.first.wait_for(state="visible", timeout=15000)
+            if not await page.locator(LOGIN_FORM_SELECTOR).first.is_visible():
+                print("会话有效，跳过登录。")
+                return
+        except Exception as e:
+            print(f"⚠️ 复用登录状态失败: {e}")
+        print("登录状态已过期，重新登录...")
+
+    await login(page)
+    if await page.locator(MENU_SELECTOR).first.is_visible():
+        await page.context.storage_state(path=base.SESSION_PATH)
+        print(f"登录状态已保存到 {base.SESSION_PATH}")
+
+@stage()
+async def goto_appointment_center(page):
+    print("正在跳转到预约中心...")
+    try:
+        await page.locator("li").filter(has_text="预约").first.click()
+
+        sub_menu_btn = page.locator("li").filter(has_text="预约中心").first
+        try:
+            with timed_wait("menu:预约中心"):
+                await sub_menu_btn.wait_for(state="visible", timeout=5000)
+            await sub_menu_btn.click()
+        except Exception:
+            await sub_menu_btn.click(force=True)
+
+        with timed_wait("center"):
+            target = page.get_by_text("预约视图").or_(page.locator(CALENDAR_CONTAINER))
+            await target.first.wait_for(state="visible", timeout=15000)
+
+        view_tab = page.locator("div").filter(has_text="预约视图").last
+        if await view_tab.is_visible():
+            print("正在切换到【预约视图】(日历模式)...")
+            await view_tab.click()
+
+        with timed_wait("calendar"):
+            await page.wait_for_selector(CALENDAR_CONTAINER, timeout=15000)
+        print("日历视图加载完成。")
+    except Exception as e:
+        print(f"跳转导航警告: {e}")
+        print("尝试继续执行...")
+
+async def wait_quiet(page, quiet_ms=600, timeout=10000):
+    try:
+        with timed_wait("scroll_quiet"):
+            await page.wait_for_function(QUIET_JS, arg=quiet_ms, timeout=timeout, polling=100)
+    except PlaywrightTimeoutError:
+        pass
+
+@stage("scroll")
+async def harvest_cards(page, max_steps=60) -> list:
+    """calendar_scroll.CalendarScroller.harvest 的异步版"""
+    await page.evaluate(INSTALL_JS, CARD_SELECTOR)
+    await wait_quiet(page)
+
+    steps = 0
+    last_count = await page.evaluate("() => window.__cardHarvest.seen.size")
+    while steps < max_steps:
+        state = await page.evaluate(STEP_JS, 0.9)
+        steps += 1
+        await wait_quiet(page)
+        count = await page.evaluate("() => window.__cardHarvest.seen.size")
+        if state["atBottom"] and count == last_count:
+            break
+        last_count = count
+
+    cards = {}
+    for card in await page.evaluate("() => Array.from(window.__cardHarvest.seen.values())"):
+        card["fingerprint"] = card_fingerprint(card)
+        cards.setdefault(card["fingerprint"], card)
+    print(f"滚动完成: 共 {steps} 步，收集到 {len(cards)} 个卡片。")
+    return list(cards.values())
+
+async def locate_card(page, card: dict):
+    for attempt in range(2):
+        for info in await page.evaluate(SNAPSHOT_JS, CARD_SELECTOR):
+            if card_fingerprint(info) == card["fingerprint"]:
+                return page.locator(CARD_SELECTOR).nth(info["index"])
+        if attempt == 0:
+            await page.evaluate(
+                "t => { const s = window.__cardHarvest; if (s) { s.box.scrollTop = t; s.lastMutation = performance.now(); } }",
+                card.get("scrollTop", 0))
+            await wait_quiet(page)
+    return None
+
+@stage("extract_detail_from_modal")
+async def read_modal(page) -> dict:
+    """等弹窗出现，一次 evaluate 取回头部文字和所有键值对"""
+    with timed_wait("modal_open"):
+        await page.locator(MODAL_SELECTOR).first.wait_for(state="visible", timeout=5000)
+    return await page.evaluate(MODAL_JS)
+
+async def close_modal(page):
+    await page.keyboard.press("Escape")
+    try:
+        with timed_wait("modal_close"):
+            await page.locator(MODAL_SELECTOR).first.wait_for(state="hidden", timeout=5000)
+    except PlaywrightTimeoutError:
+        pass
+
+# ---------------- 流水线 ----------------
+
+@stage("process_appointments")
+async def browse_cards(page, raw_queue: asyncio.Queue, shard=None, label="", checkpoint: Checkpoint = None):
+    """浏览器任务：只负责点开弹窗、取文字、关弹窗，解析交给后面的任务"""
+    print(f"\n>>> {label}开始执行滚动扫描 <<<")
+    try:
+        all_cards = await harvest_cards(page)
+    except Exception as e:
+        print(f"滚动过程出现小问题，按当前页面继续: {e}")
+        all_cards = await page.evaluate(SNAPSHOT_JS, CARD_SELECTOR)
+        for card in all_cards:
+            card["fingerprint"] = card_fingerprint(card)
+
+    blue_cards = [c for c in all_cards if "blue" in c["classes"]]
+    if shard:
+        blue_cards = shard_cards(blue_cards, *shard)
+    if checkpoint:
+        blue_cards = [c for c in blue_cards if not checkpoint.is_done(c["fingerprint"])]
+    count = len(blue_cards)
+    print(f"--> {label}共 {len(all_cards)} 个卡片，发现 {count} 个蓝色卡片待处理。")
+
+    for i, info in enumerate(blue_cards):
+        card = await locate_card(page, info)
+        if card is None:
+            print(f"[{label}{i+1}/{count}] 找不到卡片 {info['name']}，跳过")
+            continue
+        try:
+            print(f"[{label}{i+1}/{count}] 处理: {info['name'] or f'第 {i+1} 个卡片'}")
+            await card.click()
+            modal = await read_modal(page)
+            await raw_queue.put(("modal", modal, {FINGERPRINT_KEY: info["fingerprint"]}))
+        except Exception as e:
+            print(f"   -> 处理出错: {e}")
+        finally:
+            await close_modal(page)
+
+async def browse_network(page, capture: CalendarCapture, raw_queue: asyncio.Queue,
+                         checkpoint: Checkpoint = None) -> bool:
+    """
+    接口模式（--network）：接口数据直接进解析队列，只有缺字段的才点开弹窗。
+    补齐失败的不写入也不记断点，下次运行再试。
+    """
+    try:
+        await page.wait_for_load_state("networkidle", timeout=10000)
+    except Exception:
+        pass
+
+    payloads = []
+    for response in capture.responses:
+        try:
+            payloads.append(await response.json())
+        except Exception:
+            continue
+    records = rows_from_payloads(payloads)
+    if not records:
+        print("⚠️ 没有从接口里识别出预约数据，改用点击弹窗模式。")
+        return False
+
+    blue_cards = await page.evaluate(SNAPSHOT_JS, BLUE_CARD_SELECTOR)
+    blue_names = {c["name"] for c in blue_cards}
+    arrived = [r for r in records if is_arrived(r, blue_names)]
+    print(f"--> 接口返回 {len(records)} 条预约，其中 {len(arrived)} 条已到店。")
+    for record in arrived:
+        if record.get("_id") is not None:
+            record[FINGERPRINT_KEY] = f"api:{record['_id']}"
+    if checkpoint:
+        arrived = [r for r in arrived if not checkpoint.is_done(r.get(FINGERPRINT_KEY))]
+
+    failed = 0
+    for record in arrived:
+        if all(record.get(f) for f in REQUIRED_FIELDS):
+            await raw_queue.put(("record", None, record))
+            continue
+        card = find_card(blue_cards, record)
+        if card is None:
+            print(f"   -> {record.get('姓名', '')}: 找不到对应的卡片（或同名同时间的不止一张），跳过")
+            failed += 1
+            continue
+        try:
+            await page.locator(BLUE_CARD_SELECTOR).nth(card["index"]).click()
+            modal = await read_modal(page)
+            if not modal_matches(record, modal_fields(modal)):
+                raise ValueError(f"弹窗里的姓名和接口记录 {record.get('姓名', '')} 对不上")
+            await raw_queue.put(("modal", modal, record))
+        except Exception as e:
+            print(f"   -> 弹窗补齐失败: {e}")
+            failed += 1
+        finally:
+            await close_modal(page)
+    if failed:
+        print(f"⚠️ 有 {failed} 条预约没有处理成功，下次运行会重新处理。")
+    return True
+
+async def parse_worker(raw_queue: asyncio.Queue, store_queue: asyncio.Queue):
+    """解析任务：弹窗文字 → 字段 dict；接口记录优先于弹窗字段"""
+    while True:
+        item = await raw_queue.get()
+        if item is _DONE:
+            await store_queue.put(_DONE)
+            return
+        kind, modal, record = item
+        try:
+            raw_data = {}
+            if kind == "modal":
+                raw_data = modal_fields(modal)
+            if record:
+                raw_data.update({k: v for k, v in record.items() if v})
+            await store_queue.put(raw_data)
+        except Exception as e:
+            print(f"   -> 解析出错: {e}")
+
+async def persist_worker(store_queue: asyncio.Queue, store):
+    """写入任务：查重 + 写入预约库（同步的 SQLite 提交放到线程里做，不卡住浏览器任务）"""
+    while True:
+        raw_data = await store_queue.get()
+        if raw_data is _DONE:
+            return
+        try:
+            # 一次只写一行，写入顺序不变；预约库和断点日志内部都有锁，可以在别的线程里调用
+            await asyncio.to_thread(store, raw_data)
+        except Exception as e:
+            print(f"   -> 写入出错: {e}")
+
+# ---------------- 主程序 ----------------
+
+async def run(args):
+    raw_queue = asyncio.Queue()
+    store_queue = asyncio.Queue()
+
+    async with async_playwright() as p:
+        browser = await launch_browser(p, args.profile)
+        stats = RequestStats()
+        context = await new_context_async(browser, args.profile, stats, storage_state=saved_state(base.SESSION_PATH))
+        page = await context.new_page()
+        page.set_default_timeout(30000)
+
+        await start_session(page, force_login=args.relogin)
+        capture = CalendarCapture(page) if args.network else None
+        await goto_appointment_center(page)
+
+        checkpoint = Checkpoint(base.CHECKPOINT_PATH, resume=args.resume,
+                                seen=SeenCards(base.SEEN_CARDS_PATH, rescan=args.rescan))
+
+        with checkpoint, AppointmentStore(base.DB_PATH, import_from=base.EXCEL_PATH) as db:
+            store = partial(base.store_record, db=db, checkpoint=checkpoint)
+            consumers = [
+                asyncio.create_task(parse_worker(raw_queue, store_queue)),
+                asyncio.create_task(persist_worker(store_queue, store)),
+            ]
+
+            workers = max(1, min(args.workers, MAX_WORKERS))
+            if workers > 1:
+                # 同一个浏览器里开多个 context，共用刚保存的登录状态
+                async def run_context(worker_id):
+                    ctx = await new_context_async(browser, args.profile, stats,
+                                                  storage_state=saved_state(base.SESSION_PATH))
+                    worker_page = await ctx.new_page()
+                    worker_page.set_default_timeout(30000)
+                    await start_session(worker_page)
+                    await goto_appointment_center(worker_page)
+                    await browse_cards(worker_page, raw_queue, shard=(worker_id, workers, args.shard_by),
+                                       label=f"worker-{worker_id} ", checkpoint=checkpoint)
+                    await ctx.close()
+
+                print(f"启动 {workers} 个并行 context...")
+                results = await asyncio.gather(*(run_context(i) for i in range(workers)), return_exceptions=True)
+                for worker_id, result in enumerate(results):
+                    if isinstance(result, Exception):
+                        print(f"⚠️ worker-{worker_id} 异常退出: {result}")
+            elif not (capture and await browse_network(page, capture, raw_queue, checkpoint)):
+                await browse_cards(page, raw_queue, checkpoint=checkpoint)
+
+            await raw_queue.put(_DONE)
+            await asyncio.gather(*consumers)
+            db.export_excel(base.EXCEL_PATH)
+
+        print_wait_summary()
+        write_report(args.report, waits=WAIT_LOG, counts={
+            "cards_opened": len(STAGE_LOG["extract_detail_from_modal"]),
+            "rows_written": db.inserted,
+            "requests_loaded": stats.loaded,
+        })
+        stats.report()
+        if not PROFILES[args.profile]["headless"]:
+            print("\n所有任务完成，程序将在 5 秒后关闭...")
+            await asyncio.sleep(5)
+        await browser.close()
+
+def main():
+    # 命令行参数和同步版一样，但常驻模式和多日补录只有同步版有
+    args = base.parse_args()
+    if args.watch or args.date_from or args.date_to:
+        print("⚠️ 异步版不支持 --watch / --from / --to，"
+              "常驻模式和多日补录请用 appointment_html_optimized.py 运行。")
+        return
+    if args.stream_metrics:
+        stream_metrics(args.stream_metrics)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,39 @@
 from playwright.sync_api import sync_playwright
-import pandas as pd
+import argparse
 import time
-import os
-import re
-from datetime import datetime
+from functools import partial
+from datetime import date, datetime
+
+from appointment_store import AppointmentStore
+from backfill import BackfillLedger, calendar_fingerprint, iter_periods, parse_day
+from browser_profile import PROFILES, RequestStats, launch_browser, new_context
+from calendar_scroll import CalendarScroller
+from card_snapshot import snapshot_cards
+from checkpoint import FINGERPRINT_KEY, Checkpoint
+from detail_extract import read_modal
+from calendar_capture import CalendarCapture, REQUIRED_FIELDS, find_card, is_arrived, modal_matches
+from run_metrics import STAGE_LOG, stage, stream_metrics, trim_logs, write_report
+from seen_cards import SeenCards
+from session import saved_state, start_session
+from worker_pool import MAX_WORKERS, run_pool, shard_cards
+from waits import (WAIT_LOG, timed_wait, wait_logged_in, wait_menu_item, wait_center_loaded, wait_calendar,
+                   wait_modal_closed, print_wait_summary)
 
 # ---------------- 配置信息 ----------------
 URL = "https://emsvip.linkedlife.cn/"
 COMPANY = "xm-lf"
 USERNAME = "前台"
 PASSWORD = "123"
-EXCEL_PATH = "appointments.xlsx"
+EXCEL_PATH = "appointments.xlsx"  # 运行结束时从预约库导出
+DB_PATH = "appointments.db"  # 预约库（SQLite），查重和写入都在这里
+SESSION_PATH = "session_state.json"  # 保存的登录状态，下次启动直接复用
+CHECKPOINT_PATH = "checkpoint.jsonl"  # 已处理卡片的日志，--resume 时跳过
+SEEN_CARDS_PATH = "seen_cards.jsonl"  # 以前运行中已导出卡片的指纹，点击前直接跳过
+BACKFILL_LEDGER_PATH = "backfill_ledger.json"  # 多日补录时每天的完成记录
+REPORT_PATH = "run_report.json"  # 各阶段耗时报告
+
+# 常驻模式：每轮询多少次换一个新的浏览器 context，防止内存一直涨
+RECYCLE_EVERY = 30
 
 # ---------------- 工具函数 ----------------
 
@@ -27,67 +50,47 @@ def parse_date_time(raw_time_str):
     except Exception as e:
         return raw_time_str, ""
 
-def get_next_index():
-    """获取 Excel 下一个序号"""
-    if not os.path.exists(EXCEL_PATH): return 1
-    try:
-        df = pd.read_excel(EXCEL_PATH)
-        if "序号" in df.columns and not df.empty:
-            return int(df["序号"].max()) + 1
-        return 1
-    except:
-        return 1
-
-def save_to_excel(raw_data: dict):
-    """保存到 Excel"""
+@stage()
+def save_to_excel(raw_data: dict, db: AppointmentStore) -> bool:
+    """写入预约库（单行 INSERT，序号由库分配），Excel 在运行结束时统一导出；已存在返回 False"""
     date_str, time_str = parse_date_time(raw_data.get("预约时间", ""))
     
     # 构建数据行
     new_row = {
-        "序号": get_next_index(),
         "上门日期": date_str,
         "具体时间": time_str,
         "顾客姓名": raw_data.get("姓名", ""),
         "病历号/会员卡号": raw_data.get("会员号", ""),
-        "来源渠道": raw_data.get("客户来源", "")
+        "来源渠道": raw_data.get("客户来源", ""),
     }
 
-    df_new = pd.DataFrame([new_row])
-
-    if os.path.exists(EXCEL_PATH):
-        df_old = pd.read_excel(EXCEL_PATH)
-        # 确保列类型一致，防止报错
-        if "病历号/会员卡号" in df_old.columns:
-            df_old["病历号/会员卡号"] = df_old["病历号/会员卡号"].astype(str)
-        df = pd.concat([df_old, df_new], ignore_index=True)
-    else:
-        df = df_new
-        cols = ["序号", "上门日期", "具体时间", "顾客姓名", "病历号/会员卡号", "来源渠道"]
-        # 简单的列存在性检查
-        valid_cols = [c for c in cols if c in df.columns]
-        df = df[valid_cols]
-    
-    df.to_excel(EXCEL_PATH, index=False)
-    print(f"✅ [写入成功] 序号: {new_row['序号']} | 姓名: {new_row['顾客姓名']}")
+    seq = db.insert(new_row)
+    if seq is None:
+        return False
+    print(f"✅ [写入成功] 序号: {seq} | 姓名: {new_row['顾客姓名']}")
+    return True
 
-def already_exists(member_id: str, date_check: str) -> bool:
-    """防止重复录入"""
-    if not os.path.exists(EXCEL_PATH): return False
-    try:
-        df = pd.read_excel(EXCEL_PATH)
-        if "病历号/会员卡号" in df.columns and "上门日期" in df.columns:
-            # 统一转为字符串比较，防止 excel 里的数字和读取的字符串不匹配
-            df["病历号/会员卡号"] = df["病历号/会员卡号"].astype(str)
-            filtered = df[df["病历号/会员卡号"] == str(member_id)]
-            if not filtered.empty:
-                if date_check in filtered["上门日期"].values:
-                    return True
-    except Exception as e:
-        print(f"查重读取失败: {e}")
-    return False
+def already_exists(member_id: str, date_check: str, db: AppointmentStore) -> bool:
+    """防止重复录入（(会员号, 上门日期) 唯一索引查询）"""
+    return db.contains(member_id, date_check)
+
+def store_record(raw_data: dict, db: AppointmentStore, checkpoint: Checkpoint = None):
+    """
+    查重后写入；INSERT 提交后即已落盘，马上记入断点日志。
+    只有写入成功，或者按非空的 (会员号, 上门日期) 确认库里已有，才会走到记日志这一步：
+    会员号/日期为空的行不参与查重（见 AppointmentStore），总会写入；出错时抛异常，不记。
+    """
+    date_check, _ = parse_date_time(raw_data.get("预约时间", ""))
+
+    # 其他进程可能刚好写了同一条，INSERT OR IGNORE 兜底
+    if already_exists(raw_data.get("会员号"), date_check, db) or not save_to_excel(raw_data, db):
+        print(f"   -> 跳过 (预约库中已存在)")
+    if checkpoint:
+        checkpoint.mark(raw_data.get(FINGERPRINT_KEY))
 
 # ---------------- 页面行为 ----------------
 
+@stage()
 def login(page):
     print("正在登录...")
     try:
@@ -103,27 +106,27 @@ def login(page):
         page.get_by_role("button", name="登 录").click()
         
         # 等待左侧菜单加载
-        page.wait_for_selector("text=预约", timeout=30000)
+        wait_logged_in(page, timeout=30000)
         print("登录成功。")
     except Exception as e:
         print(f"登录过程出错: {e}")
 
+@stage()
 def goto_appointment_center(page):
     print("正在跳转到预约中心...")
     try:
         # 1. 点击一级菜单 "预约"
         menu_btn = page.locator("li").filter(has_text="预约").first
         menu_btn.click()
-        time.sleep(1)
         
-        # 2. 点击二级菜单 "预约中心"
-        sub_menu_btn = page.locator("li").filter(has_text="预约中心").first
-        if sub_menu_btn.is_visible():
+        # 2. 点击二级菜单 "预约中心"（等它展开，没展开就强制点）
+        try:
+            sub_menu_btn = wait_menu_item(page, "预约中心", timeout=5000)
             sub_menu_btn.click()
-        else:
-            sub_menu_btn.click(force=True)
+        except Exception:
+            page.locator("li").filter(has_text="预约中心").first.click(force=True)
         
-        time.sleep(5)
+        wait_center_loaded(page, timeout=15000)
 
         # 3. 切换视图
         view_tab = page.locator("div").filter(has_text="预约视图").last
@@ -132,150 +135,346 @@ def goto_appointment_center(page):
             view_tab.click()
         
         # 4. 等待加载
-        page.wait_for_selector(".appointment-block-container, .fc-view-container", timeout=15000)
-        print("日历视图加载完成。")
+        count = wait_calendar(page, ".appointment-block-container", timeout=15000)
+        print(f"日历视图加载完成，当前 {count} 个卡片。")
         
     except Exception as e:
         print(f"跳转导航警告: {e}")
         print("尝试继续执行...")
 
+@stage()
 def extract_detail_from_modal(page) -> dict:
-    """提取弹窗数据"""
-    data = {}
-    # 等待弹窗内容
-    page.locator(".ant-modal-content").first.wait_for(timeout=5000)
-    modal_text = page.locator(".ant-modal-body").inner_text()
-    
-    try:
-        # 头部信息
-        header = page.locator(".header-info").inner_text()
-        # 提取会员号
-        id_match = re.search(r"\d{6,}", header)
-        data["会员号"] = id_match.group(0) if id_match else ""
-        
-        # 提取姓名
-        lines = header.split('\n')
-        name_candidate = lines[0].strip()
-        data["姓名"] = re.sub(r'[^\u4e00-\u9fa5a-zA-Z]', '', name_candidate)
-    except:
-        data["姓名"] = "未知"
-        data["会员号"] = ""
-
-    # 提取键值对
-    for line in modal_text.split('\n'):
-        if "：" in line:
-            parts = line.split("：", 1)
-            if len(parts) == 2:
-                data[parts[0].strip()] = parts[1].strip()
-            
-    return data
+    """提取弹窗数据（等弹窗出现后一次 evaluate 取回头部和所有键值对）"""
+    return read_modal(page, timeout=5000)
 
-def process_appointments(page):
-    blue_card_selector = "div.appointment-block-container.blue"
+@stage("scroll")
+def scan_calendar(page):
+    """自适应滚动：滚到卡片数量稳定为止，边滚边收集，返回 (scroller, 全部卡片)"""
+    card_selector = "div.appointment-block-container"
     
     print("\n>>> 开始执行滚动扫描 <<<")
     
-    # ---------------- 新增：滚动加载逻辑 ----------------
-    # 尝试在页面中心位置进行滚轮滚动，触发懒加载
-    # 很多日历是在 div 内部滚动的，所以我们将鼠标移动到屏幕中间
+    scroller = CalendarScroller(page, card_selector)
     try:
-        page.mouse.move(x=500, y=500)
-        
-        # 循环滚动几次，确保底部卡片加载出来
-        # range(5) 表示滚动 5 次，每次滚动 2000 像素，你可以根据数据量调整次数
-        for i in range(1, 6):
-            print(f"正在向下滚动 ({i}/5)...")
-            page.mouse.wheel(delta_x=0, delta_y=2000)
-            time.sleep(2) # 每次滚动后等待 2 秒让数据渲染
-            
-        print("滚动完成，等待 DOM 稳定...")
-        time.sleep(2)
-        
+        all_cards = scroller.harvest()
     except Exception as e:
-        print(f"滚动过程出现小问题（不影响主流程）: {e}")
+        print(f"滚动过程出现小问题，按当前页面继续: {e}")
+        all_cards = snapshot_cards(page, card_selector)
+    return scroller, all_cards
+
+@stage()
+def process_appointments(page, store, shard=None, checkpoint: Checkpoint = None, scanned=None) -> int:
+    """
+    扫描并处理蓝色卡片，提取到的数据交给 store(raw_data) 查重写入，返回处理失败的卡片数。
+    shard=(worker_id, workers, by) 时只处理分给这个 worker 的卡片；
+    checkpoint 里已完成的卡片直接跳过，不再点击；
+    scanned 是已经做过的 scan_calendar 结果（补录时先扫描算指纹，不用再滚一遍）。
+    """
+    scroller, all_cards = scanned or scan_calendar(page)
 
     # ---------------- 扫描与处理 ----------------
     
     print("正在扫描【蓝色/已到店】卡片...")
-    
-    # 再次等待，确保滚动后的元素已就位
-    try:
-        page.wait_for_selector(blue_card_selector, timeout=5000)
-    except:
-        pass # 超时也没关系，依靠下面的 count 判断
-
-    cards = page.locator(blue_card_selector)
-    count = cards.count()
-    print(f"--> 发现 {count} 个蓝色卡片待处理。")
+    blue_cards = [c for c in all_cards if "blue" in c["classes"]]
+    if shard:
+        blue_cards = shard_cards(blue_cards, *shard)
+    skipped = 0
+    if checkpoint:
+        pending = [c for c in blue_cards if not checkpoint.is_done(c["fingerprint"])]
+        skipped = len(blue_cards) - len(pending)
+        if skipped:
+            print(f"--> 已导出或断点日志中已完成 {skipped} 个，点击前直接跳过。")
+        blue_cards = pending
+    count = len(blue_cards)
+    print(f"--> 共 {len(all_cards)} 个卡片，发现 {count} 个蓝色卡片待处理。")
 
     if count == 0:
-        print("⚠️ 依然未检测到蓝色卡片。请检查：\n1. 页面上是否真的有蓝色卡片？\n2. 是否需要手动筛选日期？")
-        return
+        if skipped:
+            print("所有蓝色卡片都已处理过，没有新的卡片需要处理。")
+        else:
+            print("⚠️ 依然未检测到蓝色卡片。请检查：\n1. 页面上是否真的有蓝色卡片？\n2. 是否需要手动筛选日期？")
+        return 0
 
+    failed = 0
     # 遍历处理
-    for i in range(count):
-        # 注意：在 Playwright 中，当你操作完第一个元素，页面DOM可能刷新，
-        # 所以每次循环最好重新获取一下列表的引用，或者使用 .nth(i) 这种动态定位
-        
-        card = cards.nth(i)
-        
-        # 确保卡片在可视区域（Playwright 点击前会自动滚动，但显示出来更安全）
-        try:
-            card.scroll_into_view_if_needed()
-        except:
-            pass
+    for i, info in enumerate(blue_cards):
+        # 日历可能做了虚拟化，按指纹找回卡片（必要时滚回它所在的位置）
+        card = scroller.locate(info)
+        if card is None:
+            print(f"[{i+1}/{count}] 找不到卡片 {info['name']}，跳过")
+            failed += 1
+            continue
 
         try:
             # 获取名字日志
-            try:
-                card_name = card.locator(".user-name").inner_text().strip()
-            except:
-                card_name = f"第 {i+1} 个卡片"
+            card_name = info["name"] or f"第 {i+1} 个卡片"
 
             print(f"[{i+1}/{count}] 处理: {card_name}")
             
             # 点击卡片
             card.click()
             
-            # 提取详情
+            # 提取详情 + 查重写入
             raw_data = extract_detail_from_modal(page)
-            
-            # 查重逻辑
-            date_check, _ = parse_date_time(raw_data.get("预约时间", ""))
-            
-            if already_exists(raw_data.get("会员号"), date_check):
-                print(f"   -> 跳过 (Excel中已存在)")
-            else:
-                save_to_excel(raw_data)
+            raw_data[FINGERPRINT_KEY] = info["fingerprint"]
+            store(raw_data)
             
             # 关闭弹窗
             page.keyboard.press("Escape")
-            time.sleep(1) # 等待弹窗完全关闭
+            wait_modal_closed(page) # 等待弹窗完全关闭
             
         except Exception as e:
             print(f"   -> 处理出错: {e}")
+            failed += 1
             # 出错后尝试按 ESC 复位，防止阻挡下一个
             page.keyboard.press("Escape")
-            time.sleep(1)
+            wait_modal_closed(page)
+
+    return failed
+
+def run_backfill(page, start, end, store, checkpoint: Checkpoint, ledger: BackfillLedger):
+    """
+    多日补录：逐页翻日历，台账里指纹没变的日子不点开任何弹窗直接跳过；
+    其余日子照常处理，全部成功（每行写入时已提交到预约库）才记为完成。
+    """
+    for shown in iter_periods(page, start, end):
+        day = shown.isoformat()
+        print(f"\n======== {day} ========")
+        checkpoint.set_day(day)
+        scanned = scan_calendar(page)
+        fingerprint = calendar_fingerprint(scanned[1])
+        if ledger.is_complete(day, fingerprint):
+            print(f"--> {day} 已完整导出且日历没有变化（{fingerprint['count']} 个卡片），跳过。")
+            continue
+
+        failed = process_appointments(page, store, checkpoint=checkpoint, scanned=scanned)
+        if failed:
+            print(f"⚠️ {day} 有 {failed} 个卡片未处理成功，下次补录会重新检查这一天。")
+        else:
+            ledger.mark_complete(day, fingerprint)
+
+def harvest_from_network(page, capture: CalendarCapture, store, checkpoint: Checkpoint = None) -> bool:
+    """
+    接口模式：直接用日历接口返回的数据生成行，只有接口缺字段的卡片才点开弹窗补齐。
+    补齐失败（找不到对应卡片、弹窗出错、弹窗里的姓名对不上）的不写入也不记断点，下次运行再试。
+    没有抓到任何接口数据时返回 False，由调用方走原来的点击流程。
+    """
+    blue_card_selector = "div.appointment-block-container.blue"
+
+    try:
+        page.wait_for_load_state("networkidle", timeout=10000)
+    except Exception:
+        pass
+
+    records = capture.appointments()
+    if not records:
+        print("⚠️ 没有从接口里识别出预约数据，改用点击弹窗模式。")
+        return False
+
+    # 接口里没有状态时用页面上蓝色卡片的名字判断（一次调用拿全部名字）
+    try:
+        blue_cards = snapshot_cards(page, blue_card_selector)
+    except Exception:
+        blue_cards = []
+    blue_names = {c["name"] for c in blue_cards}
+
+    arrived = [r for r in records if is_arrived(r, blue_names)]
+    print(f"--> 接口返回 {len(records)} 条预约，其中 {len(arrived)} 条已到店。")
+    for record in arrived:
+        if record.get("_id") is not None:
+            record[FINGERPRINT_KEY] = f"api:{record['_id']}"
+    if checkpoint:
+        arrived = [r for r in arrived if not checkpoint.is_done(r.get(FINGERPRINT_KEY))]
+
+    failed = 0
+    for i, record in enumerate(arrived):
+        name = record.get("姓名", "")
+        missing = [f for f in REQUIRED_FIELDS if not record.get(f)]
+        print(f"[{i+1}/{len(arrived)}] 处理: {name}" + (f" (缺少 {'/'.join(missing)}，打开弹窗补齐)" if missing else ""))
+
+        raw_data = record
+        if missing:
+            card = find_card(blue_cards, record)
+            if card is None:
+                print("   -> 找不到对应的卡片（或同名同时间的不止一张），跳过")
+                failed += 1
+                continue
+            try:
+                page.locator(blue_card_selector).nth(card["index"]).click()
+                modal_data = extract_detail_from_modal(page)
+                if not modal_matches(record, modal_data):
+                    raise ValueError(f"弹窗里是 {modal_data['姓名']}，和接口记录对不上")
+                # 接口里有的字段优先，弹窗只补缺的
+                raw_data = {**modal_data, **{k: v for k, v in record.items() if v}}
+            except Exception as e:
+                print(f"   -> 弹窗补齐失败: {e}")
+                failed += 1
+                continue
+            finally:
+                page.keyboard.press("Escape")
+                wait_modal_closed(page)
+
+        try:
+            store(raw_data)
+        except Exception as e:
+            print(f"   -> 处理出错: {e}")
+            failed += 1
+
+    if failed:
+        print(f"⚠️ 有 {failed} 条预约没有处理成功，下次运行会重新处理。")
+    return True
+
+def open_session(browser, profile: str, stats: RequestStats, force_login=False):
+    """新建 context（复用保存的登录状态）并确认已登录，返回 (context, page)"""
+    context = new_context(browser, profile, stats, storage_state=saved_state(SESSION_PATH))
+    page = context.new_page()
+    page.set_default_timeout(30000)
+    start_session(page, URL, login, SESSION_PATH, force_login=force_login)
+    return context, page
+
+def refresh_calendar(page):
+    """常驻模式下重新拉一次日历数据：刷新页面，回不到日历时再走一遍菜单"""
+    with timed_wait("calendar_refresh"):
+        page.reload(wait_until="domcontentloaded")
+    try:
+        wait_calendar(page, ".appointment-block-container", timeout=10000)
+    except Exception:
+        goto_appointment_center(page)
+
+def run_daemon(browser, context, page, profile: str, stats: RequestStats, store, checkpoint: Checkpoint,
+               db: AppointmentStore, interval_minutes: float, recycle_every=RECYCLE_EVERY):
+    """
+    常驻模式：浏览器和登录状态一直保持，每 interval_minutes 分钟重新读一次日历。
+    和上一轮的卡片快照比较，只打开新出现或状态/颜色变化（指纹变了）的蓝色卡片；
+    已经处理过的卡片记在 checkpoint 里，不会再点。本轮有新写入时重新导出 Excel。
+    每 recycle_every 轮或出错后换一个新的 context。Ctrl+C 退出。
+    """
+    previous = None
+    polls = 0
+    recycle = False
+    print(f"\n>>> 常驻模式：每 {interval_minutes:g} 分钟同步一次，Ctrl+C 退出 <<<")
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                if recycle or (polls and recycle_every and polls % recycle_every == 0):
+                    print("♻️ 回收浏览器 context...")
+                    context.close()
+                    context, page = open_session(browser, profile, stats)
+                    goto_appointment_center(page)
+                    recycle = False
+                elif polls:
+                    refresh_calendar(page)
+
+                checkpoint.set_day(date.today().isoformat())
+                scroller, cards = scan_calendar(page)
+                current = {c["fingerprint"] for c in cards}
+                if previous is not None:
+                    print(f"[第 {polls + 1} 轮] 新增/变化 {len(current - previous)} 个卡片，消失 {len(previous - current)} 个")
+                previous = current
+                inserted = db.inserted
+                process_appointments(page, store, checkpoint=checkpoint, scanned=(scroller, cards))
+                if db.inserted > inserted:
+                    db.export_excel(EXCEL_PATH)
+            except Exception as e:
+                print(f"⚠️ 本轮同步出错，下一轮换新的 context: {e}")
+                recycle = True
+
+            polls += 1
+            trim_logs(WAIT_LOG)
+            elapsed = time.perf_counter() - started
+            print(f"--> 第 {polls} 轮同步用时 {elapsed:.2f}s")
+            time.sleep(max(0.0, interval_minutes * 60 - elapsed))
+    except KeyboardInterrupt:
+        print("\n常驻模式已停止。")
+
+def run_worker(worker_id: int, workers: int, emit, shard_by="index", profile="desktop", checkpoint=None):
+    """并行模式的 worker：独立浏览器 + 共享登录状态，只处理分给自己的卡片"""
+    with sync_playwright() as p:
+        browser = launch_browser(p, profile)
+        stats = RequestStats()
+        context, page = open_session(browser, profile, stats)
+        goto_appointment_center(page)
+        process_appointments(page, emit, shard=(worker_id, workers, shard_by), checkpoint=checkpoint)
+        stats.report()
+        browser.close()
 
 # ---------------- 主程序 ----------------
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="预约中心到店记录导出")
+    parser.add_argument("--network", action="store_true",
+                        help="接口模式：从日历的 XHR/JSON 响应直接提取，只在缺字段时点开弹窗")
+    parser.add_argument("--relogin", action="store_true",
+                        help="忽略保存的登录状态，强制重新登录")
+    parser.add_argument("--workers", type=int, default=1,
+                        help=f"并行 worker 数量（最多 {MAX_WORKERS}），大于 1 时多个浏览器分片处理卡片")
+    parser.add_argument("--shard-by", choices=["index", "column"], default="index",
+                        help="并行时的分片方式：按卡片轮流分，或按医生列分")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="desktop",
+                        help="浏览器配置：desktop 有界面；production 无界面并拦截图片/字体/统计脚本")
+    parser.add_argument("--resume", action="store_true",
+                        help="断点续跑：跳过上次运行中已经完成的卡片")
+    parser.add_argument("--rescan", action="store_true",
+                        help="不按已导出卡片记录跳过，所有蓝色卡片都重新点开一遍")
+    parser.add_argument("--from", dest="date_from", type=parse_day,
+                        help="多日补录起始日期（YYYY-MM-DD），已完整导出且没有变化的日子直接跳过")
+    parser.add_argument("--to", dest="date_to", type=parse_day,
+                        help="多日补录结束日期（YYYY-MM-DD），默认与 --from 相同")
+    parser.add_argument("--watch", type=float, metavar="MINUTES",
+                        help="常驻模式：保持浏览器登录，每隔 MINUTES 分钟只处理新增或状态变化的卡片")
+    parser.add_argument("--recycle-every", type=int, default=RECYCLE_EVERY,
+                        help=f"常驻模式下每轮询多少次换一个新的浏览器 context（默认 {RECYCLE_EVERY}）")
+    parser.add_argument("--report", default=REPORT_PATH,
+                        help=f"结束时写出各阶段耗时报告的路径（默认 {REPORT_PATH}）")
+    parser.add_argument("--stream-metrics", nargs="?", const="-", metavar="FILE",
+                        help="运行中每个阶段结束就输出一行 JSON 耗时（不写 FILE 时输出到 stderr）")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    if args.stream_metrics:
+        stream_metrics(args.stream_metrics)
     with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=False, 
-            args=["--start-maximized", "--disable-blink-features=AutomationControlled"]
-        )
-        context = browser.new_context(no_viewport=True)
-        page = context.new_page()
-        page.set_default_timeout(30000)
-
-        login(page)
+        browser = launch_browser(p, args.profile)
+        stats = RequestStats()
+        context, page = open_session(browser, args.profile, stats, force_login=args.relogin)
+        # 接口监听要在进入预约中心之前挂上，才能收到日历加载时的请求
+        capture = CalendarCapture(page) if args.network else None
         goto_appointment_center(page)
-        process_appointments(page)
+        checkpoint = Checkpoint(CHECKPOINT_PATH, resume=args.resume,
+                                seen=SeenCards(SEEN_CARDS_PATH, rescan=args.rescan))
+
+        with checkpoint, AppointmentStore(DB_PATH, import_from=EXCEL_PATH) as db:
+            store = partial(store_record, db=db, checkpoint=checkpoint)
+            if args.watch:
+                if args.workers > 1 or args.network or args.date_from:
+                    print("⚠️ 常驻模式只支持单窗口点击模式，忽略 --workers / --network / --from。")
+                run_daemon(browser, context, page, args.profile, stats, store, checkpoint, db,
+                           args.watch, args.recycle_every)
+            elif args.date_from:
+                if args.workers > 1 or args.network:
+                    print("⚠️ 多日补录只支持单窗口点击模式，忽略 --workers / --network。")
+                run_backfill(page, args.date_from, args.date_to or args.date_from, store,
+                             checkpoint, BackfillLedger(BACKFILL_LEDGER_PATH))
+            elif args.workers > 1:
+                # 主窗口只负责登录并保存状态，卡片交给各 worker 分片处理
+                run_pool(partial(run_worker, shard_by=args.shard_by, profile=args.profile, checkpoint=checkpoint),
+                         args.workers, store)
+            elif not (capture and harvest_from_network(page, capture, store, checkpoint)):
+                process_appointments(page, store, checkpoint=checkpoint)
+            db.export_excel(EXCEL_PATH)
         
-        print("\n所有任务完成，程序将在 5 秒后关闭...")
-        time.sleep(5)
+        print_wait_summary()
+        write_report(args.report, waits=WAIT_LOG, counts={
+            "cards_opened": len(STAGE_LOG["extract_detail_from_modal"]),
+            "rows_written": db.inserted,
+            "requests_loaded": stats.loaded,
+        })
+        stats.report()
+        if not PROFILES[args.profile]["headless"]:
+            print("\n所有任务完成，程序将在 5 秒后关闭...")
+            time.sleep(5)
         browser.close()
 
 if __name__ == "__main__":
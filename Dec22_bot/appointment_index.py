@@ -0,0 +1,122 @@
+import json
+import os
+
+import pandas as pd
+
+from normalize import normalize
+
+# ---------------- 查重索引 ----------------
+# 原来 already_exists 每张卡片都要 read_excel 整个工作簿。
+# AppointmentIndex 启动时加载一次查重键（比如会员号）的集合，之后都在内存里查，
+# 每次查重都是 O(1)。
+# 落盘后把已写入文件的索引存到旁边的 .index.json，下次启动如果工作簿没变就直接读它，
+# 不用重新解析整个 xlsx；工作簿被手动改过（大小/修改时间对不上）就重新解析。
+
+
+def _file_signature(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _key(values):
+    """查重键；有任何一列为空时返回 None（没有会员号的行不参与查重，各自写入）"""
+    key = tuple(normalize(v) for v in values)
+    return key if all(key) else None
+
+
+class AppointmentIndex:
+    """内存中的查重集合"""
+
+    def __init__(self, excel_path, key_columns, sidecar_path=None):
+        self.excel_path = excel_path
+        self.key_columns = tuple(key_columns)
+        if sidecar_path is None:
+            root, _ = os.path.splitext(excel_path)
+            sidecar_path = f"{root}.index.json"
+        self.sidecar_path = sidecar_path
+
+        self.keys = set()
+        # 已经确认写进 xlsx 的部分，只有这部分会存进 sidecar
+        self._flushed_keys = set()
+
+        self._load()
+
+    # ---------------- 对外接口 ----------------
+
+    def contains(self, *key) -> bool:
+        """键里有空值（比如没有会员号）时没法查重，总是返回 False"""
+        key = _key(key)
+        return key is not None and key in self.keys
+
+    def add(self, *key):
+        key = _key(key)
+        if key is not None:
+            self.keys.add(key)
+
+    def on_flush(self, rows):
+        """ExcelSink 落盘成功后的回调：记录已写入的行并刷新 sidecar"""
+        for row in rows:
+            key = self._row_key(row)
+            if key is not None:
+                self._flushed_keys.add(key)
+        self._save()
+
+    # ---------------- 加载 / 保存 ----------------
+
+    def _row_key(self, row):
+        return _key(row.get(c) for c in self.key_columns)
+
+    def _load(self):
+        if not os.path.exists(self.excel_path) or os.path.getsize(self.excel_path) == 0:
+            return
+
+        if self._load_sidecar():
+            print(f"查重索引: 从 {self.sidecar_path} 加载 {len(self.keys)} 条记录")
+            return
+
+        converters = {c: str for c in self.key_columns}
+        df = pd.read_excel(self.excel_path, converters=converters)
+        if all(c in df.columns for c in self.key_columns):
+            for values in df[list(self.key_columns)].itertuples(index=False, name=None):
+                key = _key(values)
+                if key is not None:
+                    self._flushed_keys.add(key)
+
+        self.keys = set(self._flushed_keys)
+        print(f"查重索引: 解析 {self.excel_path} 得到 {len(self.keys)} 条记录")
+        self._save()
+
+    def _load_sidecar(self) -> bool:
+        if not os.path.exists(self.sidecar_path):
+            return False
+        try:
+            with open(self.sidecar_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if state.get("source") != _file_signature(self.excel_path):
+            return False
+        if state.get("key_columns") != list(self.key_columns):
+            return False
+
+        # 旧版 sidecar 里可能有带空值的键，不参与查重
+        self._flushed_keys = {tuple(k) for k in state.get("keys", []) if all(k)}
+        self.keys = set(self._flushed_keys)
+        return True
+
+    def _save(self):
+        if not os.path.exists(self.excel_path):
+            return
+        state = {
+            "source": _file_signature(self.excel_path),
+            "key_columns": list(self.key_columns),
+            "keys": sorted(self._flushed_keys),
+        }
+        tmp_path = self.sidecar_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.sidecar_path)
+        except OSError as e:
+            print(f"⚠️ 查重索引保存失败（不影响本次运行）: {e}")
@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from normalize import normalize
+from run_metrics import stage
+
+# ---------------- SQLite 预约库 ----------------
+# appointments.xlsx 原来既是数据库又是报表：每次查重、追加都要解析/重写整个 xlsx，
+# 两个脚本同时跑还可能把文件写坏。
+# AppointmentStore 把数据放进本地 SQLite：(会员号, 上门日期) 上有唯一索引，序号由数据库自增分配，
+# 每写一张卡片就是一次带索引的单行 INSERT，提交后即已落盘。
+# 多个进程同时写靠 WAL + busy_timeout 排队，唯一索引保证不会重复录入。
+# 会员号或上门日期为空的行这两个字段存 NULL：SQLite 的唯一索引不把 NULL 当成相同的值，
+# 没有会员号的几张卡片各自写一行，不会被当成重复合并掉。
+# Excel 只是导出结果：export_excel 一次性按原来的六列格式写出（运行结束时调用，或单独执行
+#   python appointment_store.py --excel appointments.xlsx）。
+# 导出会整表重写，所以库里记着每次导出的文件摘要：目标文件在上次导出之后被人改过（手工修改、删行、
+# 加列），或者不是由预约库导出的，就不覆盖它，改写到旁边的 <文件名>_导出.xlsx 并提示；
+# 确认可以覆盖时用 --force。
+# 第一次打开空库时，如果已有 appointments.xlsx，就把里面的行（连同序号）导入进来，
+# 同时记下它的摘要，之后的导出可以直接覆盖它。
+
+DB_PATH = "appointments.db"
+EXCEL_COLUMNS = ["序号", "上门日期", "具体时间", "顾客姓名", "病历号/会员卡号", "来源渠道"]
+
+# Excel 列名 -> 表字段
+_FIELDS = {
+    "序号": "seq",
+    "上门日期": "visit_date",
+    "具体时间": "visit_time",
+    "顾客姓名": "name",
+    "病历号/会员卡号": "member_id",
+    "来源渠道": "source",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS appointments (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    visit_date TEXT,
+    visit_time TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT '',
+    member_id TEXT,
+    source TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE UNIQUE INDEX IF NOT EXISTS appointments_member_day ON appointments (member_id, visit_date);
+CREATE TABLE IF NOT EXISTS exports (
+    path TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    exported_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+"""
+
+
+# 查重用的两列，为空时存 NULL
+_KEY_COLUMNS = ("上门日期", "病历号/会员卡号")
+
+
+def _column_value(col, value):
+    text = normalize(value)
+    if col in _KEY_COLUMNS and not text:
+        return None
+    return text
+
+
+def _file_digest(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class AppointmentStore:
+    """(会员号, 上门日期) 唯一的预约表，序号自增"""
+
+    def __init__(self, db_path=DB_PATH, import_from=None):
+        """import_from: 库是空的时候从这个 Excel 导入已有数据"""
+        self.db_path = db_path
+        self.inserted = 0  # 本次运行新写入的行数
+        self._lock = threading.Lock()
+        # 写入可能来自 SingleWriter 等其他线程，同一时间只有一个线程用连接（见 _lock）
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate_nullable_keys()
+        if import_from and self.count() == 0:
+            self.import_excel(import_from)
+
+    def _migrate_nullable_keys(self):
+        """早期的库里会员号/上门日期是 NOT NULL、空值存成 ''，重建表改成可以为 NULL"""
+        notnull = {r[1]: r[3] for r in self._conn.execute("PRAGMA table_info(appointments)")}
+        if not (notnull.get("member_id") or notnull.get("visit_date")):
+            return
+        self._conn.executescript(f"""
+            BEGIN;
+            ALTER TABLE appointments RENAME TO appointments_old;
+            DROP INDEX appointments_member_day;
+            {_SCHEMA}
+            INSERT INTO appointments (seq, visit_date, visit_time, name, member_id, source, created_at)
+                SELECT seq, NULLIF(visit_date, ''), visit_time, name, NULLIF(member_id, ''), source, created_at
+                FROM appointments_old;
+            DROP TABLE appointments_old;
+            COMMIT;
+        """)
+
+    # ---------------- 对外接口 ----------------
+
+    def contains(self, member_id, visit_date) -> bool:
+        """会员号或上门日期为空时没法查重，总是返回 False"""
+        member_id, visit_date = normalize(member_id), normalize(visit_date)
+        if not member_id or not visit_date:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM appointments WHERE member_id = ? AND visit_date = ?",
+                (member_id, visit_date),
+            ).fetchone()
+        return row is not None
+
+    def insert(self, row: dict):
+        """写入一行（Excel 列名的 dict，序号不用给），返回分配的序号；已存在时返回 None"""
+        values = tuple(_column_value(col, row.get(col)) for col in EXCEL_COLUMNS[1:])
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO appointments (visit_date, visit_time, name, member_id, source) "
+                "VALUES (?, ?, ?, ?, ?)",
+                values,
+            )
+        if not cur.rowcount:
+            return None
+        self.inserted += 1
+        return cur.lastrowid
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+
+    def import_excel(self, excel_path: str) -> int:
+        """把已有工作簿里的行导入（保留原序号），返回导入的行数"""
+        if not os.path.exists(excel_path) or os.path.getsize(excel_path) == 0:
+            return 0
+        df = pd.read_excel(excel_path, converters={"病历号/会员卡号": str})
+        if not all(c in df.columns for c in EXCEL_COLUMNS):
+            print(f"⚠️ {excel_path} 的列和预约表不一致，不导入")
+            return 0
+        seqs = pd.to_numeric(df["序号"], errors="coerce")
+        rows = [
+            (None if pd.isna(seq) else int(seq), *(_column_value(c, v) for c, v in zip(EXCEL_COLUMNS[1:], values)))
+            for seq, values in zip(seqs, df[EXCEL_COLUMNS[1:]].itertuples(index=False, name=None))
+        ]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO appointments (seq, visit_date, visit_time, name, member_id, source) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            imported = self._conn.total_changes - before
+        # 导入过的工作簿内容都在库里了，之后导出可以直接覆盖它（导入后又被改过的照样不覆盖）
+        self._record_export(excel_path)
+        print(f"预约库: 从 {excel_path} 导入 {imported} 行")
+        return imported
+
+    @stage("excel_export")
+    def export_excel(self, excel_path: str, force=False) -> int:
+        """
+        按原来的六列格式整表导出到 Excel（先写临时文件再替换），返回行数。
+        excel_path 在上次导出后被改过时不覆盖，写到 <文件名>_导出.xlsx；force=True 时直接覆盖。
+        """
+        columns = ", ".join(f"{field} AS \"{col}\"" for col, field in _FIELDS.items())
+        with self._lock:
+            df = pd.read_sql_query(f"SELECT {columns} FROM appointments ORDER BY seq", self._conn)
+
+        root, ext = os.path.splitext(excel_path)
+        if not force and self._changed_since_export(excel_path):
+            print(f"⚠️ {excel_path} 在上次导出后被修改过（或不是预约库导出的），不覆盖，"
+                  f"改写到 {root}_导出{ext}；确认可以覆盖时运行 "
+                  f"python appointment_store.py --excel {excel_path} --force")
+            excel_path = f"{root}_导出{ext}"
+            root, ext = os.path.splitext(excel_path)
+
+        tmp_path = f"{root}.tmp{ext}"
+        df.to_excel(tmp_path, index=False)
+        os.replace(tmp_path, excel_path)
+        self._record_export(excel_path)
+        print(f"💾 [导出] {len(df)} 行 -> {excel_path}")
+        return len(df)
+
+    def _record_export(self, excel_path: str):
+        """记下 excel_path 现在的内容摘要：和库里的数据一致，下次导出可以覆盖"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO exports (path, digest) VALUES (?, ?)",
+                (os.path.abspath(excel_path), _file_digest(excel_path)),
+            )
+
+    def _changed_since_export(self, excel_path: str) -> bool:
+        # 仓库里的 appointments.xlsx 可能是 0 字节占位文件，按不存在处理
+        if not os.path.exists(excel_path) or os.path.getsize(excel_path) == 0:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM exports WHERE path = ?", (os.path.abspath(excel_path),)
+            ).fetchone()
+        return row is None or row[0] != _file_digest(excel_path)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把预约库导出成 Excel")
+    parser.add_argument("--db", default=DB_PATH, help=f"预约库路径（默认 {DB_PATH}）")
+    parser.add_argument("--excel", default="appointments.xlsx", help="导出的 Excel 路径")
+    parser.add_argument("--force", action="store_true",
+                        help="Excel 在上次导出后被修改过也直接覆盖（默认改写到 <文件名>_导出.xlsx）")
+    args = parser.parse_args()
+    with AppointmentStore(args.db) as db:
+        db.export_excel(args.excel, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,29 @@
 from playwright.sync_api import sync_playwright
-import pandas as pd
 import time
-import os
 import re
-from datetime import datetime
+from datetime import date, datetime
+
+from appointment_store import AppointmentStore
+from card_snapshot import snapshot_cards
+from detail_extract import read_modal
+from run_metrics import STAGE_LOG, stage, stream_metrics, write_report
+from seen_cards import SeenCards
+from session import saved_state, start_session
+from waits import (WAIT_LOG, wait_logged_in, wait_menu_item, wait_calendar,
+                   wait_modal_closed, print_wait_summary)
 
 # ---------------- 配置信息 ----------------
 URL = "https://emsvip.linkedlife.cn/"
 COMPANY = "xm-lf"
 USERNAME = "前台"
 PASSWORD = "123"
-EXCEL_PATH = "appointments.xlsx"
+EXCEL_PATH = "appointments.xlsx"  # 运行结束时从预约库导出
+DB_PATH = "appointments.db"  # 预约库（SQLite），查重和写入都在这里
+SESSION_PATH = "session_state.json"  # 保存的登录状态，下次启动直接复用
+SEEN_CARDS_PATH = "seen_cards.jsonl"  # 以前运行中已导出卡片的指纹，点击前直接跳过
+REPORT_PATH = "run_report.json"  # 各阶段耗时报告
+STREAM_METRICS = None  # 设为 "-"（stderr）或文件路径时，运行中实时输出各阶段耗时
+HEADLESS = False  # 无界面运行（放在服务器上或跑 benchmark 时设为 True）
 
 # ---------------- 工具函数 ----------------
 
@@ -27,67 +40,43 @@ def parse_date_time(raw_time_str):
     except Exception as e:
         return raw_time_str, ""
 
-def get_next_index():
-    """获取 Excel 下一个序号"""
-    if not os.path.exists(EXCEL_PATH): return 1
-    try:
-        df = pd.read_excel(EXCEL_PATH)
-        if "序号" in df.columns and not df.empty:
-            return int(df["序号"].max()) + 1
-        return 1
-    except:
-        return 1
-
-def save_to_excel(raw_data: dict):
-    """保存到 Excel"""
+@stage()
+def save_to_excel(raw_data: dict, db: AppointmentStore) -> bool:
+    """写入预约库（单行 INSERT，序号由库分配），Excel 在运行结束时统一导出；已存在返回 False"""
     date_str, time_str = parse_date_time(raw_data.get("预约时间", ""))
     new_row = {
-        "序号": get_next_index(),
         "上门日期": date_str,
         "具体时间": time_str,
         "顾客姓名": raw_data.get("姓名", ""),
         "病历号/会员卡号": raw_data.get("会员号", ""),
-        "来源渠道": raw_data.get("客户来源", "")
+        "来源渠道": raw_data.get("客户来源", ""),
     }
 
-    df_new = pd.DataFrame([new_row])
-
-    if os.path.exists(EXCEL_PATH):
-        df_old = pd.read_excel(EXCEL_PATH)
-        if "病历号/会员卡号" in df_old.columns:
-            df_old["病历号/会员卡号"] = df_old["病历号/会员卡号"].astype(str)
-        df = pd.concat([df_old, df_new], ignore_index=True)
-    else:
-        df = df_new
-        cols = ["序号", "上门日期", "具体时间", "顾客姓名", "病历号/会员卡号", "来源渠道"]
-        df = df[cols]
-    
-    df.to_excel(EXCEL_PATH, index=False)
-    print(f"✅ [写入成功] 序号: {new_row['序号']} | 姓名: {new_row['顾客姓名']}")
+    seq = db.insert(new_row)
+    if seq is None:
+        return False
+    print(f"✅ [写入成功] 序号: {seq} | 姓名: {new_row['顾客姓名']}")
+    return True
+
+_RGB_RE = re.compile(r"rgb\((\d+),\s*(\d+),\s*(\d+)\)")
 
 def is_blue_card(rgb_string: str) -> bool:
     """颜色判断逻辑"""
     if not rgb_string: return False
-    match = re.search(r"rgb\((\d+),\s*(\d+),\s*(\d+)\)", rgb_string)
+    match = _RGB_RE.search(rgb_string)
     if not match: return False
     r, g, b = map(int, match.groups())
     if b > r and b > 200: return True
     if b > 220 and r < 230: return True
     return False
 
-def already_exists(member_id: str, date_check: str) -> bool:
-    """防止重复录入"""
-    if not os.path.exists(EXCEL_PATH): return False
-    df = pd.read_excel(EXCEL_PATH)
-    if "病历号/会员卡号" in df.columns and "上门日期" in df.columns:
-        filtered = df[df["病历号/会员卡号"].astype(str) == str(member_id)]
-        if not filtered.empty:
-            if date_check in filtered["上门日期"].values:
-                return True
-    return False
+def already_exists(member_id: str, date_check: str, db: AppointmentStore) -> bool:
+    """防止重复录入（(会员号, 上门日期) 唯一索引查询）"""
+    return db.contains(member_id, date_check)
 
 # ---------------- 页面行为 ----------------
 
+@stage()
 def login(page):
     print("正在登录...")
     # --- 增强点 1: 网络波动重试机制 ---
@@ -112,24 +101,23 @@ def login(page):
         page.get_by_role("button", name="登 录").click()
         
         print("等待跳转...")
-        page.wait_for_selector("text=预约", timeout=30000)
-        page.wait_for_selector("text=预约中心", timeout=30000)
+        wait_logged_in(page, timeout=30000)
         print("登录成功。")
     except Exception as e:
         print(f"登录过程出错: {e}")
 
+@stage()
 def goto_appointment_center(page):
     print("正在跳转到预约中心...")
     try:
         menu_btn = page.locator("li").filter(has_text="预约").first
         menu_btn.click()
-        time.sleep(1)
         
-        sub_menu_btn = page.locator("li").filter(has_text="预约中心").first
-        if sub_menu_btn.is_visible():
+        try:
+            sub_menu_btn = wait_menu_item(page, "预约中心", timeout=5000)
             sub_menu_btn.click()
-        else:
-            sub_menu_btn.click(force=True)
+        except Exception:
+            page.locator("li").filter(has_text="预约中心").first.click(force=True)
 
         # 只要日历框架加载出来就算成功，内容可能还没出来
         page.wait_for_selector(".fc-view-container", timeout=20000)
@@ -138,107 +126,107 @@ def goto_appointment_center(page):
     except Exception as e:
         print(f"跳转导航失败: {e}")
 
+@stage()
 def extract_detail_from_modal(page) -> dict:
-    """提取数据"""
-    data = {}
-    page.locator(".ant-modal-content").first.wait_for(timeout=5000)
-    modal_text = page.locator(".ant-modal-body").inner_text()
-    
-    try:
-        header = page.locator(".header-info").inner_text()
-        lines = header.split('\n')
-        name_candidate = lines[0].strip()
-        data["姓名"] = re.sub(r'[^\u4e00-\u9fa5a-zA-Z]', '', name_candidate)
-        id_match = re.search(r"\d{6,}", header)
-        data["会员号"] = id_match.group(0) if id_match else ""
-    except:
-        data["姓名"] = "未知"
-        data["会员号"] = ""
-
-    for line in modal_text.split('\n'):
-        if "：" in line:
-            key, val = line.split("：", 1)
-            data[key.strip()] = val.strip()
-    return data
-
-def process_appointments(page):
-    # --- 增强点 2: 智能轮询等待 ---
+    """提取数据（一次 evaluate 取回头部和所有键值对）"""
+    return read_modal(page, timeout=5000)
+
+@stage()
+def process_appointments(page, db: AppointmentStore, seen: SeenCards = None):
+    # --- 增强点 2: 事件驱动等待：卡片一出现就继续，网络空闲仍没有卡片就结束 ---
     card_selector = "a.fc-day-grid-event"
     print("正在等待卡片渲染 (最多等待 100 秒)...")
     
-    found_cards = False
-    max_wait = 100  # 最大等待秒数
-    
-    for _ in range(max_wait // 2):
-        count = page.locator(card_selector).count()
-        if count > 0:
-            found_cards = True
-            break
-        time.sleep(2) # 每 2 秒检查一次
-        print("...加载中...")
+    try:
+        found_cards = wait_calendar(page, card_selector, timeout=100000) > 0
+    except Exception:
+        found_cards = False
     
     if not found_cards:
-        print("⚠️ 100秒内未检测到任何预约卡片，可能是因为：")
+        print("⚠️ 未检测到任何预约卡片，可能是因为：")
         print("1. 今天确实没有预约。")
         print("2. 网速过慢导致加载超时。")
         print("程序结束。")
         return
 
     cards = page.locator(card_selector)
-    count = cards.count()
-    print(f"检测到 {count} 个预约卡片，开始处理。")
-
-    for i in range(count):
+    # 一次 evaluate 取回全部卡片的颜色/名字，颜色判断在本地完成
+    snapshot = snapshot_cards(page, card_selector)
+    blue_cards = [c for c in snapshot if is_blue_card(c["bg"])]
+    print(f"检测到 {len(snapshot)} 个预约卡片，其中 {len(blue_cards)} 个蓝色，开始处理。")
+
+    # 以前已经导出过的卡片（按卡片指纹）不用再点开。
+    # 一屏显示好几天，按卡片自己所在的日期记；页面上看不出日期的才记在今天下面
+    today = date.today().isoformat()
+    if seen is not None:
+        pending = [c for c in blue_cards if not seen.contains(c.get("date") or today, c["fingerprint"])]
+        if len(pending) < len(blue_cards):
+            print(f"--> 其中 {len(blue_cards) - len(pending)} 个以前已导出，点击前直接跳过。")
+        if blue_cards and not pending:
+            print("所有蓝色卡片都已导出过，没有新的卡片需要处理。")
+        blue_cards = pending
+
+    for info in blue_cards:
+        i = info["index"]
         card = cards.nth(i)
         
-        # 颜色判断
-        bg_color = card.evaluate("el => window.getComputedStyle(el).backgroundColor")
-        if not is_blue_card(bg_color):
-            continue
-        
         try:
-            print(f"处理第 {i+1} 个卡片...")
+            print(f"处理第 {i+1} 个卡片... {info['name']}")
             card.click()
             
             raw_data = extract_detail_from_modal(page)
             date_check, _ = parse_date_time(raw_data.get("预约时间", ""))
             
-            if already_exists(raw_data.get("会员号"), date_check):
+            if already_exists(raw_data.get("会员号"), date_check, db) or not save_to_excel(raw_data, db):
                 print(f"   -> 跳过: {raw_data.get('姓名')} (已存在)")
-            else:
-                save_to_excel(raw_data)
+            # INSERT 提交后即已落盘，写没写入这张卡片都算导出过了
+            if seen is not None:
+                seen.add(info.get("date") or today, info["fingerprint"])
             
             page.keyboard.press("Escape")
-            time.sleep(0.5)
+            wait_modal_closed(page)
             
         except Exception as e:
             print(f"   -> 处理出错: {e}")
             page.keyboard.press("Escape")
+            wait_modal_closed(page)
 
 # ---------------- 主程序 ----------------
 
 def main():
+    if STREAM_METRICS:
+        stream_metrics(STREAM_METRICS)
     with sync_playwright() as p:
         # --- 增强点 3: 启动参数优化 ---
         browser = p.chromium.launch(
-            headless=False, 
+            headless=HEADLESS, 
             args=[
                 "--start-maximized", 
                 "--disable-blink-features=AutomationControlled" # 防反爬
             ]
         )
-        context = browser.new_context(no_viewport=True)
+        context = browser.new_context(no_viewport=True, storage_state=saved_state(SESSION_PATH))
         page = context.new_page()
 
         # 设置页面默认超时时间为 30秒
         page.set_default_timeout(30000)
 
-        login(page)
+        start_session(page, URL, login, SESSION_PATH)
         goto_appointment_center(page)
-        process_appointments(page)
+        seen = SeenCards(SEEN_CARDS_PATH)
+        with AppointmentStore(DB_PATH, import_from=EXCEL_PATH) as db:
+            process_appointments(page, db, seen)
+            db.export_excel(EXCEL_PATH)
+        seen.close()
         
-        print("任务完成，3秒后退出...")
-        time.sleep(3)
+        print_wait_summary()
+        write_report(REPORT_PATH, waits=WAIT_LOG, counts={
+            "cards_opened": len(STAGE_LOG["extract_detail_from_modal"]),
+            "rows_written": db.inserted,
+        })
+        if not HEADLESS:
+            print("任务完成，3秒后退出...")
+            time.sleep(3)
         browser.close()
 
 if __name__ == "__main__":
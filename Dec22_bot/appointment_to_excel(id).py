@@ -1,13 +1,29 @@
 from playwright.sync_api import sync_playwright
-import pandas as pd
-import time
-import os
+
+from appointment_index import AppointmentIndex
+from detail_extract import read_detail
+from detail_tabs import DetailTabPool
+from excel_sink import ExcelSink
+from run_metrics import STAGE_LOG, stage, stream_metrics, write_report
+from session import saved_state, start_session
+from waits import (WAIT_LOG, wait_logged_in, wait_menu_item, wait_calendar, wait_detail_page,
+                   wait_back_on_calendar, print_wait_summary)
 
 URL = "https://emsvip.linkedlife.cn/"
 COMPANY = "xm-lf"
 USERNAME = "前台"
 PASSWORD = "123"
 EXCEL_PATH = "appointments.xlsx"
+SESSION_PATH = "session_state.json"  # 保存的登录状态，下次启动直接复用
+REPORT_PATH = "run_report.json"  # 各阶段耗时报告
+STREAM_METRICS = None  # 设为 "-"（stderr）或文件路径时，运行中实时输出各阶段耗时
+HEADLESS = False  # 无界面运行（放在服务器上或跑 benchmark 时设为 True）
+CARD_SELECTOR = "div[class*='event'], div[class*='appointment']"
+DETAIL_TABS = 3  # 在几个后台标签页里并行加载详情；0 表示沿用点击 → 详情 → go_back
+
+# 写入缓冲：攒够多少行或多少秒落盘一次
+FLUSH_BATCH_SIZE = 20
+FLUSH_INTERVAL = 10
 
 
 # ---------------- 工具函数 ----------------
@@ -16,28 +32,20 @@ def clean_id(raw: str) -> str:
     return raw[:-2] if raw and len(raw) > 2 else raw
 
 
-def already_exists(member_id: str) -> bool:
-    if not os.path.exists(EXCEL_PATH):
-        return False
-    df = pd.read_excel(EXCEL_PATH)
-    return member_id in df["会员号"].values
-
+def already_exists(member_id: str, index: AppointmentIndex) -> bool:
+    return index.contains(member_id)
 
-def save_to_excel(row: dict):
-    df_new = pd.DataFrame([row])
-
-    if os.path.exists(EXCEL_PATH):
-        df_old = pd.read_excel(EXCEL_PATH)
-        df = pd.concat([df_old, df_new], ignore_index=True)
-    else:
-        df = df_new
 
-    df.to_excel(EXCEL_PATH, index=False)
+@stage()
+def save_to_excel(row: dict, sink: ExcelSink, index: AppointmentIndex):
+    index.add(row["会员号"])
+    sink.add(row)
     print("写入 Excel:", row["客户"])
 
 
 # ---------------- 页面行为 ----------------
 
+@stage()
 def login(page):
     page.goto(URL, wait_until="domcontentloaded", timeout=60000)
     page.wait_for_selector("input", timeout=20000)
@@ -48,19 +56,22 @@ def login(page):
     inputs.nth(2).type(PASSWORD, delay=100)
 
     page.get_by_role("button", name="登 录").click()
-    page.wait_for_timeout(3000)
+    wait_logged_in(page, timeout=30000)
 
     
+@stage()
 def goto_appointment_center(page):
     page.get_by_text("预约", exact=True).click()
     #page.get_by_role("button", name="预约").click()
-    page.wait_for_timeout(3000)
-    page.get_by_text("预约", exact=True).click()
-    page.wait_for_timeout(3000)
+    try:
+        wait_menu_item(page, "预约中心", timeout=3000, exact=True)
+    except Exception:
+        # 第一次点击有时只是展开侧边栏，再点一次
+        page.get_by_text("预约", exact=True).click()
+        wait_menu_item(page, "预约中心", timeout=10000, exact=True)
     page.get_by_text("预约中心", exact=True).click()
     #page.get_by_role("button", name="预约中心").click()
-    page.wait_for_timeout(8000)
-    time.sleep(5)
+    wait_calendar(page, CARD_SELECTOR, timeout=30000)
 
 
 def is_completed(page) -> bool:
@@ -68,17 +79,12 @@ def is_completed(page) -> bool:
     return page.locator("text=完成").count() > 0
 
 
+@stage()
 def extract_detail(page) -> dict:
-    data = {}
-
-    raw_id = page.locator("span.ng-star-inserted").first.inner_text().strip()
-    data["会员号"] = clean_id(raw_id)
+    detail = read_detail(page)
 
-    items = page.locator("div.appointment-detail-wrap div.item")
-    for i in range(items.count()):
-        label = items.nth(i).locator(".label").inner_text().strip().replace("：", "")
-        value = items.nth(i).locator(".content").inner_text().strip()
-        data[label] = value
+    data = {"会员号": clean_id(detail["rawId"])}
+    data.update(detail["fields"])
 
     data["客户"] = data.get("客户", "")
     data["预约时间"] = data.get("预约时间", "")
@@ -89,50 +95,83 @@ def extract_detail(page) -> dict:
     return data
 
 
-def process_all_cards(page):
-    cards = page.locator("div[class*='event'], div[class*='appointment']")
+def store_detail(detail_page, sink: ExcelSink, index: AppointmentIndex):
+    """已完成且未导出过的详情写入 Excel"""
+    # ✅ 关键判断：是否完成
+    if not is_completed(detail_page):
+        print("状态为【待确认】，跳过")
+        return
+
+    data = extract_detail(detail_page)
+
+    # ✅ 是否已存在
+    if already_exists(data["会员号"], index):
+        print("已存在，跳过：", data["会员号"])
+    else:
+        save_to_excel(data, sink, index)
+
+
+@stage()
+def process_all_cards(page, sink: ExcelSink, index: AppointmentIndex):
+    cards = page.locator(CARD_SELECTOR)
     print("检测到预约卡片数量：", cards.count())
 
+    # 详情在后台标签页里加载，主页面的日历只渲染一次
+    if DETAIL_TABS > 0:
+        with DetailTabPool(page, CARD_SELECTOR, size=DETAIL_TABS) as pool:
+            urls = pool.learn_urls()
+            if urls is not None:
+                for i, tab in pool.load(urls):
+                    if tab is None:
+                        print(f"第 {i+1} 个卡片详情加载失败，跳过")
+                        continue
+                    store_detail(tab, sink, index)
+                return
+        print("改用点击 → 详情 → 返回的方式逐个处理。")
+
+    process_by_clicking(page, sink, index)
+
+
+def process_by_clicking(page, sink: ExcelSink, index: AppointmentIndex):
+    cards = page.locator(CARD_SELECTOR)
     for i in range(cards.count()):
         card = cards.nth(i)
         card.scroll_into_view_if_needed()
-        time.sleep(0.5)
 
         card.click()
-        page.wait_for_selector("div.appointment-detail-wrap", timeout=15000)
-
-        # ✅ 关键判断：是否完成
-        if not is_completed(page):
-            print("状态为【待确认】，跳过")
-            page.go_back(wait_until="domcontentloaded")
-            page.wait_for_timeout(1500)
-            continue
-
-        data = extract_detail(page)
-
-        # ✅ 是否已存在
-        if already_exists(data["会员号"]):
-            print("已存在，跳过：", data["会员号"])
-        else:
-            save_to_excel(data)
+        wait_detail_page(page, timeout=15000)
+        store_detail(page, sink, index)
 
         page.go_back(wait_until="domcontentloaded")
-        page.wait_for_timeout(1500)
+        wait_back_on_calendar(page, CARD_SELECTOR)
 
 
 # ---------------- 主程序 ----------------
 
 def main():
+    if STREAM_METRICS:
+        stream_metrics(STREAM_METRICS)
     with sync_playwright() as p:
         browser = p.chromium.launch(
-            headless=False,
+            headless=HEADLESS,
             args=["--disable-blink-features=AutomationControlled"]
         )
-        page = browser.new_page()
+        context = browser.new_context(storage_state=saved_state(SESSION_PATH))
+        page = context.new_page()
 
-        login(page)
+        start_session(page, URL, login, SESSION_PATH)
         goto_appointment_center(page)
-        process_all_cards(page)
+        index = AppointmentIndex(EXCEL_PATH, key_columns=["会员号"])
+        with ExcelSink(EXCEL_PATH, str_columns=["会员号"],
+                       batch_size=FLUSH_BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                       on_flush=index.on_flush) as sink:
+            process_all_cards(page, sink, index)
+
+        print_wait_summary()
+        write_report(REPORT_PATH, waits=WAIT_LOG, counts={
+            "cards_opened": len(STAGE_LOG["extract_detail"]),
+            "rows_written": sink.written,
+        })
 
         browser.close()
 
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from waits import timed_wait
+
+# ---------------- 多日补录 ----------------
+# 补录一段日期时，原来要手动翻到每一天再把所有卡片点一遍，已经导完、内容没变的日子也会重点。
+# 这里逐日翻动日历，先用卡片快照算出当天的“日历指纹”（卡片数 + 所有卡片指纹的哈希），
+# 和补录台账（BACKFILL_LEDGER_PATH）里上次完整导出时的指纹比较：
+#   - 一样：当天没有变化，不打开任何弹窗直接跳过；
+#   - 不一样或没记录：照常处理，当天所有卡片都成功且数据落盘后才把新指纹记为完成。
+# 日历是周视图时每次翻一周，台账按每一页显示的起始日期记录。
+
+BACKFILL_LEDGER_PATH = "backfill_ledger.json"
+
+# 日历翻页按钮和标题（FullCalendar / ant-design 日期选择器常见写法，按顺序找第一个可见的）
+PREV_SELECTORS = (".fc-prev-button", "button:has(.anticon-left)", "text=前一天", "text=上一天")
+NEXT_SELECTORS = (".fc-next-button", "button:has(.anticon-right)", "text=后一天", "text=下一天")
+TITLE_SELECTORS = (".fc-toolbar-title", ".fc-toolbar h2", ".fc-center h2", ".ant-picker-input input")
+
+_READ_TITLE_JS = """
+sels => {
+    for (const sel of sels) {
+        const el = document.querySelector(sel);
+        if (!el) continue;
+        const text = (el.value || el.innerText || '').trim();
+        if (text) return text;
+    }
+    return '';
+}
+"""
+
+_FULL_DATE = re.compile(r"(\d{4})\s*[年/.-]\s*(\d{1,2})\s*[月/.-]\s*(\d{1,2})")
+_MONTH_DAY = re.compile(r"(\d{1,2})\s*月\s*(\d{1,2})\s*日")
+
+
+def parse_day(value: str) -> date:
+    """命令行日期：2025-12-01 或 2025/12/01"""
+    return datetime.strptime(value.replace("/", "-"), "%Y-%m-%d").date()
+
+
+def parse_title_date(title: str, default_year=None):
+    """从日历标题里取第一个日期（周视图标题取的是这一周的第一天）"""
+    match = _FULL_DATE.search(title or "")
+    if match:
+        return date(*map(int, match.groups()))
+    match = _MONTH_DAY.search(title or "")
+    if match:
+        return date(default_year or date.today().year, *map(int, match.groups()))
+    return None
+
+
+def calendar_fingerprint(cards) -> dict:
+    """当天所有卡片（不只蓝色）的数量和指纹哈希；卡片变蓝、新增、取消都会让哈希变化"""
+    digest = hashlib.sha1("\n".join(sorted(c["fingerprint"] for c in cards)).encode("utf-8")).hexdigest()
+    return {"count": len(cards), "hash": digest}
+
+
+class BackfillLedger:
+    """每一天的完成记录：{日期: {count, hash, completed_at}}"""
+
+    def __init__(self, path=BACKFILL_LEDGER_PATH):
+        self.path = path
+        self.days = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.days = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 补录台账读取失败，按全部未完成处理: {e}")
+
+    def is_complete(self, day: str, fingerprint: dict) -> bool:
+        entry = self.days.get(day)
+        return bool(entry) and entry.get("count") == fingerprint["count"] and entry.get("hash") == fingerprint["hash"]
+
+    def mark_complete(self, day: str, fingerprint: dict):
+        self.days[day] = {**fingerprint, "completed_at": datetime.now().isoformat(timespec="seconds")}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.days, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def current_period(page, default_year=None):
+    """日历当前显示的日期（周视图为这一周的第一天），读不出来返回 None"""
+    title = page.evaluate(_READ_TITLE_JS, list(TITLE_SELECTORS))
+    return parse_title_date(title, default_year)
+
+
+def _click_first_visible(page, selectors):
+    for sel in selectors:
+        button = page.locator(sel).first
+        if button.count() and button.is_visible():
+            button.click()
+            return
+    raise RuntimeError(f"找不到日历翻页按钮: {selectors}")
+
+
+def step_period(page, forward=True, timeout=15000):
+    """日历往前/后翻一页，等标题变化后返回新日期"""
+    sels = list(TITLE_SELECTORS)
+    before = page.evaluate(_READ_TITLE_JS, sels)
+    with timed_wait("calendar_step"):
+        _click_first_visible(page, NEXT_SELECTORS if forward else PREV_SELECTORS)
+        page.wait_for_function(f"([sels, before]) => ({_READ_TITLE_JS.strip()})(sels) !== before",
+                               arg=[sels, before], timeout=timeout)
+    return current_period(page)
+
+
+def iter_periods(page, start: date, end: date, max_steps=400):
+    """
+    把日历翻到 start 所在的那一页，再逐页往后翻到 end，每到一页 yield 它的日期。
+    调用方在两次 yield 之间处理当前页面上的卡片。
+    先往后、往前各翻一次，量出一页是一天还是一周。
+    """
+    shown = current_period(page, start.year)
+    if shown is None:
+        raise RuntimeError("读不出日历当前显示的日期，无法自动翻页")
+    steps = 0
+
+    def move(forward):
+        nonlocal shown, steps
+        if steps >= max_steps:
+            raise RuntimeError(f"翻页超过 {max_steps} 次，补录中止")
+        new = step_period(page, forward)
+        steps += 1
+        if new is None or (new <= shown if forward else new >= shown):
+            raise RuntimeError("日历翻页没有生效")
+        span = abs((new - shown).days)
+        shown = new
+        return span
+
+    move(True)
+    span = move(False)
+
+    while shown > start:
+        move(False)
+    while shown + timedelta(days=span) <= start:
+        move(True)
+    while True:
+        yield shown
+        if shown + timedelta(days=span) > end:
+            return
+        move(True)
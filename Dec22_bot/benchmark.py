@@ -0,0 +1,166 @@
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from mock_ems import MockEMS
+from run_metrics import STAGE_LOG, summarize
+from waits import WAIT_LOG
+
+# ---------------- 端到端基准测试 ----------------
+# 每个脚本对着本地 mock_ems 跑一遍完整流程（登录 → 预约中心 → 处理卡片 → 写 Excel），
+# 输出每秒处理的卡片数和每 100 张卡片的耗时，改动前后各跑一次就能看出变快还是变慢。
+# 各脚本的 URL / EXCEL_PATH 等配置在运行前替换成模拟站点和临时目录，不会碰线上系统和真实的表格。
+# 处理耗时取 run_metrics 里“处理卡片”那个阶段的总时间，不含登录和浏览器启动。
+#
+#   python benchmark.py --cards 100 --modal-latency 150
+#   python benchmark.py --variants html_optimized async --repeat 3
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = "benchmark_results.json"
+
+# 名称 -> (脚本文件, 模拟站点布局, 处理卡片阶段, 打开单张卡片阶段, 命令行参数, 期望写入行数)
+#   期望行数: "arrived" 只导蓝色卡片；"all" 每张卡片都导
+VARIANTS = {
+    "html_optimized": ("appointment_html_optimized.py", "modal", "process_appointments",
+                       "extract_detail_from_modal", ["--profile", "production"], "arrived"),
+    "html_network": ("appointment_html_optimized.py", "modal", "process_appointments",
+                     "extract_detail_from_modal", ["--profile", "production", "--network"], "arrived"),
+    "async": ("appointment_async.py", "modal", "process_appointments",
+              "extract_detail_from_modal", ["--profile", "production"], "arrived"),
+    "gemini": ("appointment_to_excel(gemini).py", "modal", "process_appointments",
+               "extract_detail_from_modal", [], "arrived"),
+    "to_excel": ("appointment_to_excel.py", "detail", "process_all_cards", "extract_detail", [], "all"),
+    "to_excel_id": ("appointment_to_excel(id).py", "detail", "process_all_cards", "extract_detail", [], "arrived"),
+}
+
+# 各脚本里可能出现的本地文件配置，跑之前统一指到临时目录
+_PATH_SETTINGS = ("EXCEL_PATH", "DB_PATH", "SESSION_PATH", "CHECKPOINT_PATH", "SEEN_CARDS_PATH",
+                  "BACKFILL_LEDGER_PATH", "REPORT_PATH")
+
+
+def load_variant(filename: str):
+    """按文件名加载脚本；appointment_to_excel(id).py 这类带括号的文件名不能直接 import"""
+    module_name = os.path.splitext(filename)[0]
+    if module_name.isidentifier():
+        return importlib.import_module(module_name)
+    safe_name = "bench_" + "".join(c if c.isalnum() else "_" for c in module_name)
+    if safe_name in sys.modules:
+        return sys.modules[safe_name]
+    spec = importlib.util.spec_from_file_location(safe_name, os.path.join(BENCH_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[safe_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def configure(module, url: str, workdir: str):
+    """把脚本的站点地址和本地文件都换掉；async 版的配置在它导入的同步版模块上"""
+    targets = [module]
+    if hasattr(module, "base"):
+        targets.append(module.base)
+    for target in targets:
+        target.URL = url
+        for name in _PATH_SETTINGS:
+            if hasattr(target, name):
+                setattr(target, name, os.path.join(workdir, os.path.basename(getattr(target, name))))
+        if hasattr(target, "HEADLESS"):
+            target.HEADLESS = True
+
+
+def count_rows(path: str) -> int:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+    return len(pd.read_excel(path))
+
+
+def run_variant(name: str, server: MockEMS) -> dict:
+    filename, _, process_stage, detail_stage, argv, expect = VARIANTS[name]
+    module = load_variant(filename)
+
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as workdir:
+        configure(module, server.url, workdir)
+        STAGE_LOG.clear()
+        WAIT_LOG.clear()
+
+        old_argv, old_cwd = sys.argv, os.getcwd()
+        sys.argv = [filename, *argv]
+        os.chdir(workdir)  # 其余相对路径（资源大小记录等）也落在临时目录里
+        start = time.perf_counter()
+        try:
+            module.main()
+        finally:
+            wall = time.perf_counter() - start
+            sys.argv = old_argv
+            os.chdir(old_cwd)
+
+        excel_path = getattr(getattr(module, "base", module), "EXCEL_PATH")
+        rows = count_rows(excel_path)
+
+    process_secs = sum(t for t, _ in STAGE_LOG.get(process_stage, []))
+    cards_opened = len(STAGE_LOG.get(detail_stage, []))
+    expected = server.cards if expect == "all" else server.expected_arrived()
+    return {
+        "variant": name,
+        "layout": server.layout,
+        "cards": server.cards,
+        "cards_opened": cards_opened,
+        "rows_written": rows,
+        "rows_expected": expected,
+        "process_secs": round(process_secs, 3),
+        "wall_secs": round(wall, 3),
+        "cards_per_sec": round(server.cards / process_secs, 3) if process_secs else None,
+        "secs_per_100_cards": round(process_secs / server.cards * 100, 3) if server.cards else None,
+        "stages": {k: summarize(v) for k, v in STAGE_LOG.items()},
+    }
+
+
+def print_table(results):
+    print("\n---- 基准测试结果 ----")
+    print(f"{'脚本':<16}{'卡片':>6}{'打开':>6}{'写入/期望':>12}{'处理耗时':>10}{'卡片/秒':>10}{'秒/100卡':>10}")
+    for r in results:
+        rate = f"{r['cards_per_sec']:.2f}" if r["cards_per_sec"] else "-"
+        per_100 = f"{r['secs_per_100_cards']:.2f}" if r["secs_per_100_cards"] is not None else "-"
+        flag = "" if r["rows_written"] == r["rows_expected"] else "  ⚠️ 行数不符"
+        print(f"{r['variant']:<16}{r['cards']:>6}{r['cards_opened']:>6}"
+              f"{r['rows_written']:>6}/{r['rows_expected']:<5}{r['process_secs']:>10.2f}{rate:>10}{per_100:>10}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对着本地模拟 EMS 跑各个爬虫脚本，比较吞吐")
+    parser.add_argument("--variants", nargs="+", choices=sorted(VARIANTS), default=sorted(VARIANTS))
+    parser.add_argument("--cards", type=int, default=60, help="模拟日历上的卡片数")
+    parser.add_argument("--blue-ratio", type=float, default=0.6)
+    parser.add_argument("--api-latency", type=int, default=300, help="日历接口延迟（毫秒）")
+    parser.add_argument("--modal-latency", type=int, default=150, help="弹窗/详情接口延迟（毫秒）")
+    parser.add_argument("--repeat", type=int, default=1, help="每个脚本跑几次")
+    parser.add_argument("--output", default=RESULTS_PATH, help="结果 JSON 路径")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.variants:
+        layout = VARIANTS[name][1]
+        for attempt in range(args.repeat):
+            print(f"\n======== {name} ({layout}) 第 {attempt + 1}/{args.repeat} 次 ========")
+            with MockEMS(cards=args.cards, blue_ratio=args.blue_ratio, layout=layout,
+                         api_latency=args.api_latency / 1000,
+                         modal_latency=args.modal_latency / 1000) as server:
+                try:
+                    results.append(run_variant(name, server))
+                except Exception as e:
+                    print(f"⚠️ {name} 运行失败: {e}")
+
+    print_table(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import json
+import os
+from collections import Counter
+from urllib.parse import urlsplit
+
+# ---------------- 浏览器配置 ----------------
+# desktop:    原来的行为，有界面、最大化窗口，所有资源都加载
+# production: 无界面 + 固定视口，拦截图片/媒体/字体和统计脚本，适合放在小服务器上跑
+# 被拦截的请求不会真的下载，所以省下的流量用之前完整加载时记录的 Content-Length 估算
+# （记录在 RESOURCE_SIZES_PATH），没记录过大小的请求单独计数。
+
+PROFILES = {
+    "desktop": {
+        "headless": False,
+        "args": ["--start-maximized", "--disable-blink-features=AutomationControlled"],
+        "context": {"no_viewport": True},
+        "block": False,
+    },
+    "production": {
+        "headless": True,
+        "args": ["--disable-blink-features=AutomationControlled"],
+        # 日历在 1600 宽下能完整显示所有医生列
+        "context": {"viewport": {"width": 1600, "height": 900}},
+        "block": True,
+    },
+}
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_URL_KEYWORDS = (
+    "google-analytics.com", "googletagmanager.com", "hm.baidu.com", "cnzz.com",
+    "umeng.com", "growingio.com", "sentry.io", "/collect?", "/track",
+)
+
+RESOURCE_SIZES_PATH = "resource_sizes.json"
+
+
+def _url_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def should_block(resource_type: str, url: str) -> bool:
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    url = url.lower()
+    return any(k in url for k in BLOCKED_URL_KEYWORDS)
+
+
+class RequestStats:
+    """统计本次运行加载/拦截的请求数和字节数"""
+
+    def __init__(self, sizes_path=RESOURCE_SIZES_PATH):
+        self.sizes_path = sizes_path
+        self.loaded = 0
+        self.loaded_bytes = 0
+        self.blocked = Counter()
+        self.blocked_bytes = 0
+        self.blocked_unknown = 0
+        self._sizes = {}
+        self._sizes_changed = False
+        if sizes_path and os.path.exists(sizes_path):
+            try:
+                with open(sizes_path, encoding="utf-8") as f:
+                    self._sizes = json.load(f)
+            except (OSError, ValueError):
+                self._sizes = {}
+
+    def on_blocked(self, resource_type: str, url: str):
+        self.blocked[resource_type] += 1
+        size = self._sizes.get(_url_key(url))
+        if size is None:
+            self.blocked_unknown += 1
+        else:
+            self.blocked_bytes += size
+
+    def on_response(self, response):
+        self.loaded += 1
+        try:
+            size = int(response.headers.get("content-length", 0))
+        except ValueError:
+            size = 0
+        self.loaded_bytes += size
+        # 完整加载时顺便记下可拦截资源的大小，供 production 模式估算
+        if size and should_block(response.request.resource_type, response.url):
+            self._sizes[_url_key(response.url)] = size
+            self._sizes_changed = True
+
+    def report(self):
+        total_blocked = sum(self.blocked.values())
+        print("\n---- 请求统计 ----")
+        print(f"加载 {self.loaded} 个请求，约 {self.loaded_bytes / 1024:.0f} KB")
+        if total_blocked:
+            detail = ", ".join(f"{t} {n}" for t, n in self.blocked.most_common())
+            print(f"拦截 {total_blocked} 个请求 ({detail})，节省约 {self.blocked_bytes / 1024:.0f} KB"
+                  + (f"（其中 {self.blocked_unknown} 个大小未知）" if self.blocked_unknown else ""))
+        self._save_sizes()
+
+    def _save_sizes(self):
+        if not (self.sizes_path and self._sizes_changed):
+            return
+        try:
+            with open(self.sizes_path, "w", encoding="utf-8") as f:
+                json.dump(self._sizes, f)
+        except OSError as e:
+            print(f"⚠️ 资源大小记录保存失败: {e}")
+
+
+def launch_browser(playwright, profile: str):
+    config = PROFILES[profile]
+    return playwright.chromium.launch(headless=config["headless"], args=config["args"])
+
+
+def new_context(browser, profile: str, stats: RequestStats, storage_state=None):
+    """按配置创建 context，并挂上请求统计；production 配置下拦截非必要资源"""
+    config = PROFILES[profile]
+    context = browser.new_context(storage_state=storage_state, **config["context"])
+    context.on("response", stats.on_response)
+
+    if config["block"]:
+        def handle(route):
+            request = route.request
+            if should_block(request.resource_type, request.url):
+                stats.on_blocked(request.resource_type, request.url)
+                route.abort()
+            else:
+                route.continue_()
+
+        context.route("**/*", handle)
+    return context
+
+
+async def new_context_async(browser, profile: str, stats: RequestStats, storage_state=None):
+    """new_context 的 async_api 版本"""
+    config = PROFILES[profile]
+    context = await browser.new_context(storage_state=storage_state, **config["context"])
+    context.on("response", stats.on_response)
+
+    if config["block"]:
+        async def handle(route):
+            request = route.request
+            if should_block(request.resource_type, request.url):
+                stats.on_blocked(request.resource_type, request.url)
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await context.route("**/*", handle)
+    return context
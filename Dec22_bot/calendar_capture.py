@@ -0,0 +1,224 @@
+import re
+from datetime import datetime
+
+# ---------------- 接口数据抓取 ----------------
+# 预约中心的日历是前端用 XHR/JSON 拉数据再渲染的。CalendarCapture 在页面加载时用
+# page.on("response") 把这些 JSON 响应收下来，直接从里面拼出和弹窗提取一样的行：
+# 姓名 / 会员号 / 预约时间 / 客户来源 / 状态 / 颜色。
+# 接口字段名没有文档，下面按候选字段名（支持 "a.b" 取嵌套字段）逐个尝试；
+# 接口里没有的字段就不放进结果，由调用方回退到点击弹窗补齐。
+
+# 只看 URL 里包含这些关键字的 JSON 响应（为空则不过滤）
+URL_HINTS = ("appointment", "reserve", "booking", "calendar", "schedule")
+
+FIELD_KEYS = {
+    "姓名": ["customerName", "memberName", "userName", "customer.name", "member.name", "name"],
+    "会员号": ["memberNo", "memberCode", "cardNo", "medicalRecordNo", "customer.memberNo", "member.cardNo"],
+    "预约时间": ["appointmentTime", "startTime", "start", "beginTime", "appointTime"],
+    "结束时间": ["endTime", "end", "finishTime"],
+    "客户来源": ["customerSource", "sourceName", "channelName", "source", "customer.sourceName"],
+    "状态": ["statusName", "statusText", "stateName", "status", "state"],
+    "颜色": ["color", "bgColor", "backgroundColor"],
+    "_id": ["id", "appointmentId", "reserveId"],
+}
+
+# 弹窗路径最终要用到的字段，接口缺哪个就回退点开弹窗
+REQUIRED_FIELDS = ("姓名", "会员号", "预约时间", "客户来源")
+
+# 对应页面上蓝色卡片（已到店）的状态文字
+ARRIVED_STATUSES = ("已到店", "到店", "已到", "已签到")
+
+_RGB_RE = re.compile(r"rgba?\((\d+),\s*(\d+),\s*(\d+)")
+_HEX_RE = re.compile(r"^#([0-9a-fA-F]{6})$")
+_CLOCK_RE = re.compile(r"(\d{1,2}):(\d{2})")
+_TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M")
+
+
+def _get(item: dict, path: str):
+    value = item
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _pick(item: dict, keys):
+    for key in keys:
+        value = _get(item, key)
+        if value not in (None, "", [], {}):
+            return value
+    return None
+
+
+def _parse_time(value):
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value.strip())
+    if isinstance(value, (int, float)):
+        # 时间戳，毫秒或秒
+        return datetime.fromtimestamp(value / 1000 if value > 1e11 else value)
+    # 去掉 ISO 格式里的 T、毫秒和时区后缀
+    text = str(value).strip().replace("T", " ").split(".")[0].split("+")[0].rstrip("Z")
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def format_time_range(start, end=None) -> str:
+    """统一成弹窗里的格式 "2025/12/22 10:00-11:00"，方便 parse_date_time 直接用"""
+    start_dt = _parse_time(start)
+    if not start_dt:
+        return str(start)
+    text = start_dt.strftime("%Y/%m/%d %H:%M")
+    end_dt = _parse_time(end) if end is not None else None
+    if end_dt:
+        text += "-" + end_dt.strftime("%H:%M")
+    return text
+
+
+def is_blue_colour(colour: str) -> bool:
+    """和 gemini 版 is_blue_card 一样的判定，额外支持 #RRGGBB"""
+    if not colour:
+        return False
+    colour = str(colour).strip()
+    match = _RGB_RE.search(colour)
+    if match:
+        r, g, b = map(int, match.groups())
+    else:
+        match = _HEX_RE.match(colour)
+        if not match:
+            return False
+        value = match.group(1)
+        r, g, b = int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+    if b > r and b > 200: return True
+    if b > 220 and r < 230: return True
+    return False
+
+
+def is_arrived(record: dict, blue_names=()) -> bool:
+    """判断一条接口记录是否对应蓝色（已到店）卡片"""
+    status = record.get("状态")
+    if status is not None and str(status).strip() in ARRIVED_STATUSES:
+        return True
+    if record.get("颜色") and is_blue_colour(record["颜色"]):
+        return True
+    # 接口里看不出状态时，用页面上蓝色卡片的名字兜底
+    return record.get("姓名", "") in blue_names
+
+
+def _start_clock(text):
+    """文字里第一个 时:分，统一成 (时, 分)；没有时返回 None"""
+    match = _CLOCK_RE.search(str(text or ""))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def find_card(cards: list, record: dict):
+    """
+    在卡片快照里找接口记录对应的卡片：名字相同，卡片上有时间的话开始时间（时:分）也要相同。
+    找不到，或者符合的不止一张时返回 None，宁可不补齐也不要把别人的会员号合并进来。
+    """
+    name = record.get("姓名", "")
+    if not name:
+        return None
+    candidates = [c for c in cards if name in (c.get("name") or c.get("text", ""))]
+    start = _start_clock(record.get("预约时间"))
+    clocks = [_start_clock(c.get("time") or c.get("text")) for c in candidates]
+    if start is not None and any(clocks):
+        # 卡片上有时间就必须对得上
+        candidates = [c for c, clock in zip(candidates, clocks) if clock == start]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def modal_matches(record: dict, modal_data: dict) -> bool:
+    """弹窗里的姓名和接口记录对得上（弹窗头部没读出姓名时不做判断）"""
+    name, modal_name = record.get("姓名", ""), modal_data.get("姓名", "")
+    if not name or modal_name in ("", "未知"):
+        return True
+    # 弹窗头部的姓名去掉了符号和数字，互相包含就算同一个人
+    return name in modal_name or modal_name in name
+
+
+def to_row(item: dict) -> dict:
+    """把接口里的一条预约转换成和 extract_detail_from_modal 相同键名的 dict"""
+    row = {}
+    for field, keys in FIELD_KEYS.items():
+        value = _pick(item, keys)
+        if value is not None and not isinstance(value, (dict, list)):
+            row[field] = value if field == "_id" else str(value).strip()
+
+    if "预约时间" in row:
+        row["预约时间"] = format_time_range(row["预约时间"], row.pop("结束时间", None))
+    else:
+        row.pop("结束时间", None)
+    return row
+
+
+def _iter_records(payload):
+    """在任意嵌套的 JSON 里找出像预约记录的 dict（同时有姓名和时间字段）"""
+    if isinstance(payload, list):
+        for value in payload:
+            yield from _iter_records(value)
+    elif isinstance(payload, dict):
+        if _pick(payload, FIELD_KEYS["姓名"]) is not None and _pick(payload, FIELD_KEYS["预约时间"]) is not None:
+            yield payload
+            return
+        for value in payload.values():
+            if isinstance(value, (dict, list)):
+                yield from _iter_records(value)
+
+
+def rows_from_payloads(payloads) -> list:
+    """从多份 JSON 里提取预约行，按 id（没有 id 时按 姓名+预约时间）去重"""
+    rows = []
+    seen = set()
+    for payload in payloads:
+        for item in _iter_records(payload):
+            row = to_row(item)
+            key = row.get("_id") or (row.get("姓名"), row.get("预约时间"))
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append(row)
+    return rows
+
+
+class CalendarCapture:
+    """挂在 page 上收集日历接口的 JSON 响应"""
+
+    def __init__(self, page, url_hints=URL_HINTS):
+        self.page = page
+        self.url_hints = tuple(h.lower() for h in url_hints)
+        self._responses = []
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return
+        if "json" not in (response.headers.get("content-type") or ""):
+            return
+        if self.url_hints and not any(h in response.url.lower() for h in self.url_hints):
+            return
+        self._responses.append(response)
+
+    def detach(self):
+        self.page.remove_listener("response", self._on_response)
+
+    def clear(self):
+        self._responses.clear()
+
+    @property
+    def responses(self) -> list:
+        return list(self._responses)
+
+    def appointments(self) -> list:
+        """解析目前收到的所有响应，返回去重后的预约行"""
+        payloads = []
+        for response in self._responses:
+            try:
+                payloads.append(response.json())
+            except Exception:
+                continue
+        return rows_from_payloads(payloads)
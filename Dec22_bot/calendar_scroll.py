@@ -0,0 +1,123 @@
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from card_snapshot import DESCRIBE_CARD_JS, card_fingerprint, snapshot_cards
+from waits import timed_wait
+
+# ---------------- 自适应滚动收集 ----------------
+# 原来固定滚 5 次、每次等 2 秒：预约少的日子白等 12 秒，预约多的日子又滚不到底。
+# CalendarScroller 找到日历自己的滚动容器，每次滚一屏，然后等 DOM 安静 quiet_ms 毫秒
+# （MutationObserver 记录最后一次变动时间）。滚到底并且安静窗口内卡片数量不再变化就停。
+# 卡片在渲染出来的那一刻就被 MutationObserver 记下来（连同当时的滚动位置），
+# 所以就算日历做了虚拟化、滚过去的卡片被移出 DOM，也不会漏掉。
+
+INSTALL_JS = f"""
+(selector) => {{
+    const describe = {DESCRIBE_CARD_JS};
+    const scrollable = (el) => {{
+        const style = window.getComputedStyle(el);
+        return /(auto|scroll)/.test(style.overflowY) && el.scrollHeight > el.clientHeight;
+    }};
+    let box = document.querySelector(selector)
+        || document.querySelector(".appointment-block-container, .fc-view-container");
+    while (box && !scrollable(box)) box = box.parentElement;
+    box = box || document.scrollingElement;
+
+    const state = {{box: box, seen: new Map(), lastMutation: performance.now()}};
+    const collect = () => {{
+        document.querySelectorAll(selector).forEach((el) => {{
+            const info = describe(el);
+            const key = [info.name, info.time, info.column, info.date, info.classes.join(" ")].join("|");
+            if (!state.seen.has(key)) state.seen.set(key, {{...info, scrollTop: box.scrollTop}});
+        }});
+    }};
+    if (window.__cardHarvest) window.__cardHarvest.observer.disconnect();
+    state.observer = new MutationObserver(() => {{
+        state.lastMutation = performance.now();
+        collect();
+    }});
+    state.observer.observe(document.body, {{childList: true, subtree: true}});
+    collect();
+    window.__cardHarvest = state;
+    return box === document.scrollingElement ? "document" : (box.className || box.tagName);
+}}
+"""
+
+STEP_JS = """
+(ratio) => {
+    const box = window.__cardHarvest.box;
+    const before = box.scrollTop;
+    box.scrollTop = before + box.clientHeight * ratio;
+    box.dispatchEvent(new Event("scroll"));
+    // 安静窗口从这次滚动开始算，懒加载请求还没回来时不会误判为已稳定
+    window.__cardHarvest.lastMutation = performance.now();
+    const atBottom = box.scrollTop + box.clientHeight >= box.scrollHeight - 2 || box.scrollTop === before;
+    return {atBottom: atBottom, count: window.__cardHarvest.seen.size};
+}
+"""
+
+QUIET_JS = "q => performance.now() - window.__cardHarvest.lastMutation >= q"
+
+
+class CalendarScroller:
+    """滚动日历直到卡片数量稳定，并收集滚动过程中出现过的所有卡片"""
+
+    def __init__(self, page, card_selector: str, quiet_ms=600, max_steps=60, step_ratio=0.9):
+        self.page = page
+        self.card_selector = card_selector
+        self.quiet_ms = quiet_ms
+        self.max_steps = max_steps
+        self.step_ratio = step_ratio
+        self.steps = 0
+
+    def _wait_quiet(self, timeout=10000):
+        try:
+            with timed_wait("scroll_quiet"):
+                self.page.wait_for_function(QUIET_JS, arg=self.quiet_ms, timeout=timeout, polling=100)
+        except PlaywrightTimeoutError:
+            # 页面一直在变（比如有动画），不再等，按当前结果继续
+            pass
+
+    def harvest(self) -> list:
+        """滚到底并返回所有见过的卡片（带 fingerprint 和 scrollTop）"""
+        box = self.page.evaluate(INSTALL_JS, self.card_selector)
+        print(f"滚动容器: {box}")
+        self._wait_quiet()
+
+        self.steps = 0
+        last_count = self.page.evaluate("() => window.__cardHarvest.seen.size")
+        while self.steps < self.max_steps:
+            state = self.page.evaluate(STEP_JS, self.step_ratio)
+            self.steps += 1
+            self._wait_quiet()
+            count = self.page.evaluate("() => window.__cardHarvest.seen.size")
+            print(f"滚动第 {self.steps} 步: 已收集 {count} 个卡片")
+            if state["atBottom"] and count == last_count:
+                break
+            last_count = count
+
+        cards = []
+        fingerprints = set()
+        for card in self.page.evaluate("() => Array.from(window.__cardHarvest.seen.values())"):
+            card["fingerprint"] = card_fingerprint(card)
+            # 点击后卡片可能多出 active 之类的 class，按指纹再去重一次
+            if card["fingerprint"] not in fingerprints:
+                fingerprints.add(card["fingerprint"])
+                cards.append(card)
+        print(f"滚动完成: 共 {self.steps} 步，收集到 {len(cards)} 个卡片。")
+        return cards
+
+    def locate(self, card: dict):
+        """
+        找回某个收集到的卡片对应的 locator：当前 DOM 里有就直接用，
+        没有（被虚拟化移走了）就滚回它出现时的位置再找。找不到返回 None。
+        """
+        for attempt in range(2):
+            for info in snapshot_cards(self.page, self.card_selector):
+                if info["fingerprint"] == card["fingerprint"]:
+                    return self.page.locator(self.card_selector).nth(info["index"])
+            if attempt == 0:
+                self.page.evaluate(
+                    "t => { const s = window.__cardHarvest; if (s) { s.box.scrollTop = t; s.lastMutation = performance.now(); } }",
+                    card.get("scrollTop", 0))
+                self._wait_quiet()
+        return None
@@ -0,0 +1,81 @@
+import hashlib
+
+# ---------------- 卡片快照 ----------------
+# 原来每张卡片都要单独 evaluate 一次背景色、再 inner_text 一次名字，N 张卡片就是 2N~3N 次往返。
+# snapshot_cards 用一次 page.evaluate 在浏览器里把所有卡片的背景色、class、名字、时间、
+# 所在列、所在日期和全文一起取回来，后面的筛选（蓝色、完成等）都在 Python 里对快照做。
+# 返回的 index 就是该卡片在 page.locator(selector) 里的位置，需要点击时用 cards.nth(index)。
+
+# 描述单个卡片的 JS 函数，calendar_scroll 的增量收集也用同一份
+DESCRIBE_CARD_JS = """
+(el) => {
+    const pick = (sel) => {
+        const node = el.querySelector(sel);
+        return node ? node.innerText.trim() : "";
+    };
+    // 所在列：表格布局用单元格下标，资源列布局用 data-* 属性，都没有就留空
+    // （不用横坐标，窗口大小、滚动位置一变指纹就对不上了）
+    let column = "";
+    const cell = el.closest("td");
+    const resource = el.closest("[data-resource-id], [data-date]");
+    if (resource) {
+        column = resource.getAttribute("data-resource-id") || resource.getAttribute("data-date");
+    } else if (cell) {
+        column = String(cell.cellIndex);
+    }
+    // 所在日期：祖先带 data-date 就用它；月/周视图（一周一行 .fc-row）找同一行里横向覆盖卡片中心的日期格
+    let day = "";
+    const dated = el.closest("[data-date]");
+    if (dated) {
+        day = dated.getAttribute("data-date");
+    } else if (el.closest(".fc-row")) {
+        const rect = el.getBoundingClientRect();
+        const x = rect.left + rect.width / 2;
+        for (const node of el.closest(".fc-row").querySelectorAll("[data-date]")) {
+            const box = node.getBoundingClientRect();
+            if (x >= box.left && x < box.right) {
+                day = node.getAttribute("data-date");
+                break;
+            }
+        }
+    }
+    return {
+        bg: window.getComputedStyle(el).backgroundColor,
+        classes: Array.from(el.classList),
+        name: pick(".user-name, .fc-title, .name"),
+        time: pick(".fc-time, .time, [class*='time']"),
+        column: column,
+        date: day,
+        text: (el.innerText || "").trim(),
+    };
+}
+"""
+
+SNAPSHOT_JS = f"""
+(selector) => {{
+    const describe = {DESCRIBE_CARD_JS};
+    return Array.from(document.querySelectorAll(selector)).map((el, i) => ({{index: i, ...describe(el)}}));
+}}
+"""
+
+# 参与指纹的 class：只取表示状态/颜色的，排除 hover、选中之类的临时 class
+_VOLATILE_CLASSES = {"active", "hover", "selected", "focus", "fc-event-hover"}
+
+
+def card_fingerprint(card: dict) -> str:
+    """卡片的稳定指纹：名字 + 时间段 + 所在列 + 状态 class（+ 所在日期，页面上看得出来时）"""
+    status = ",".join(sorted(c for c in card.get("classes", []) if c not in _VOLATILE_CLASSES))
+    parts = [card.get("name", ""), card.get("time", ""), str(card.get("column", "")), status]
+    if card.get("date"):
+        # 一屏显示多天时，不同日期的同名同时间卡片要区分开；单日视图没有日期，指纹和以前一样
+        parts.append(card["date"])
+    raw = "|".join(parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def snapshot_cards(page, selector: str) -> list:
+    """一次往返取回所有匹配卡片的信息"""
+    cards = page.evaluate(SNAPSHOT_JS, selector)
+    for card in cards:
+        card["fingerprint"] = card_fingerprint(card)
+    return cards
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import date
+
+# ---------------- 断点续跑 ----------------
+# 浏览器崩溃或网站超时后，下次运行原来要从第 0 张卡片重新点一遍。
+# Checkpoint 把已经处理完的卡片指纹逐行追加到 JSONL 日志里（每行写完就 fsync）：
+#   - 需要写入的卡片，等它那一行真正落盘（预约库 INSERT 提交）后才记，
+#     崩溃时没写进去的卡片不会被误记为完成；
+#   - 已存在、不用写入的卡片，查重后马上记。
+# --resume 时读回同一天的指纹，处理前直接跳过这些卡片，不再点击。
+# 不带 --resume 时清空日志重新开始记录。多日补录时用 set_day 切换当前日期。
+# 日志按天记，不分片：并行时各 worker 共用同一个 Checkpoint，指纹在各分片间本来就不重复，
+# 续跑时换了 worker 数量或分片方式也能照样跳过。
+# 传入 seen（SeenCards）时，完成的卡片同时记进跨运行保存的指纹集合，
+# 以前运行中已经导出的卡片不带 --resume 也直接跳过。
+
+FINGERPRINT_KEY = "_fingerprint"
+
+
+class Checkpoint:
+    """已完成卡片指纹的追加日志"""
+
+    def __init__(self, path: str, resume=False, day=None, seen=None):
+        self.path = path
+        self.day = day or date.today().isoformat()
+        self.seen = seen
+        self._done_by_day = defaultdict(set)
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(path):
+            self._load()
+            print(f"断点续跑: {self.day} 已完成 {len(self.done)} 张卡片，将直接跳过")
+        elif not resume and os.path.exists(path):
+            os.remove(path)
+
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() > 0:
+            # 上次崩溃可能停在半行，先补一个换行，免得新记录接在坏行后面
+            self._file.write("\n")
+        if seen is not None and seen.count(self.day):
+            print(f"已导出卡片记录: {self.day} 有 {seen.count(self.day)} 张，点击前直接跳过")
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半
+                    continue
+                if "day" in entry and "fp" in entry:
+                    self._done_by_day[entry["day"]].add(entry["fp"])
+
+    @property
+    def done(self) -> set:
+        return self._done_by_day[self.day]
+
+    def set_day(self, day: str):
+        """切换到另一天（多日补录），之后的 is_done / mark 都针对这一天"""
+        with self._lock:
+            self.day = day
+
+    def is_done(self, fingerprint: str) -> bool:
+        if fingerprint in self.done:
+            return True
+        return self.seen is not None and self.seen.contains(self.day, fingerprint)
+
+    def mark(self, fingerprint: str):
+        if not fingerprint:
+            return
+        with self._lock:
+            done = self._done_by_day[self.day]
+            if fingerprint in done:
+                return
+            done.add(fingerprint)
+            entry = {"day": self.day, "fp": fingerprint}
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if self.seen is not None:
+                self.seen.add(self.day, fingerprint)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        if self.seen is not None:
+            self.seen.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,70 @@
+import re
+
+from waits import MODAL_SELECTOR, timed_wait, wait_modal_open
+
+# ---------------- 一次往返提取详情 ----------------
+# 原来弹窗要分别 inner_text 正文和头部，详情页更是每个 div.item 的 label、content 各查一次，
+# 字段越多往返越多。这里在浏览器里用一次 evaluate 把头部文字和所有“标签：值”都取回来，
+# Python 这边只用预编译好的正则从头部拆出姓名和会员号。
+
+_MEMBER_ID_RE = re.compile(r"\d{6,}")
+_NAME_CLEAN_RE = re.compile(r"[^\u4e00-\u9fa5a-zA-Z]")
+
+# 弹窗：取当前可见的那个（antd 关闭后可能把旧弹窗隐藏在 DOM 里），正文按行拆成键值对
+MODAL_JS = f"""
+() => {{
+    const modal = Array.from(document.querySelectorAll("{MODAL_SELECTOR}"))
+        .find((el) => el.getClientRects().length > 0) || document;
+    const header = modal.querySelector(".header-info") || document.querySelector(".header-info");
+    const body = modal.querySelector(".ant-modal-body") || document.querySelector(".ant-modal-body");
+    const fields = {{}};
+    for (const line of (body ? body.innerText : "").split("\\n")) {{
+        const i = line.indexOf("：");
+        if (i >= 0) fields[line.slice(0, i).trim()] = line.slice(i + 1).trim();
+    }}
+    return {{header: header ? header.innerText : null, fields: fields}};
+}}
+"""
+
+# 详情页：会员号 span + 每个 div.item 的 label/content
+DETAIL_JS = """
+(wrap) => {
+    const id = document.querySelector("span.ng-star-inserted");
+    const fields = {};
+    wrap.querySelectorAll("div.item").forEach((item) => {
+        const label = item.querySelector(".label");
+        const content = item.querySelector(".content");
+        if (!label || !content) return;
+        fields[label.innerText.trim().replace(/：/g, "")] = content.innerText.trim();
+    });
+    return {rawId: id ? id.innerText.trim() : "", fields: fields};
+}
+"""
+
+
+def parse_header(header) -> dict:
+    """弹窗头部：第一行是姓名（去掉符号和数字），6 位以上的数字是会员号"""
+    if header is None:
+        return {"姓名": "未知", "会员号": ""}
+    id_match = _MEMBER_ID_RE.search(header)
+    name_candidate = header.split("\n")[0].strip()
+    return {"姓名": _NAME_CLEAN_RE.sub("", name_candidate), "会员号": id_match.group(0) if id_match else ""}
+
+
+def modal_fields(result: dict) -> dict:
+    """MODAL_JS 的结果 → 字段 dict；正文里的同名字段覆盖头部解析出来的"""
+    data = parse_header(result.get("header"))
+    data.update(result.get("fields") or {})
+    return data
+
+
+def read_modal(page, timeout=5000) -> dict:
+    """等弹窗出现，一次 evaluate 取回全部字段"""
+    wait_modal_open(page, timeout=timeout)
+    return modal_fields(page.evaluate(MODAL_JS))
+
+
+def read_detail(page, timeout=15000) -> dict:
+    """详情页一次 evaluate 取回 {rawId, fields}"""
+    with timed_wait("detail_read"):
+        return page.locator("div.appointment-detail-wrap").first.evaluate(DETAIL_JS, timeout=timeout)
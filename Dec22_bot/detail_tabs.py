@@ -0,0 +1,161 @@
+import re
+from collections import deque
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from waits import timed_wait, wait_calendar, wait_detail_page
+
+# ---------------- 后台标签页加载详情 ----------------
+# 原来每张卡片都是：点击 → 跳到详情页 → go_back → 整个日历重新加载，
+# 而且重新加载后 cards.nth(i) 不一定还是原来那张卡片。
+# DetailTabPool 让主页面一直停在日历上，详情放到几个后台标签页里打开：
+#   1. 在一个后台标签页里打开日历、点第一张卡片，记下详情页的 URL；
+#   2. 在卡片的属性（href、data-id 之类）里找出 URL 里的那段 id，得到“每张卡片的详情 URL”；
+#   3. 几个标签页轮流 goto 各自的详情 URL（只等导航提交，不等加载完），同时有几个详情在加载，
+#      按卡片顺序一个个读出来。
+# 日历整个运行只渲染一次（外加第 1 步学习时一次）。学不出 URL 规律时返回 None，调用方退回原来的点击方式。
+
+DETAIL_WRAP = "div.appointment-detail-wrap"
+
+# 卡片本身和子元素上的属性（不含 class/style），用来找详情 URL 里的 id
+_ATTRS_JS = """
+(el) => {
+    const attrs = {};
+    for (const node of [el, ...el.querySelectorAll("*")]) {
+        for (const a of node.attributes) {
+            if (a.name === "class" || a.name === "style" || !a.value) continue;
+            if (!(a.name in attrs)) attrs[a.name] = a.value;
+        }
+    }
+    return attrs;
+}
+"""
+
+_ALL_ATTRS_JS = f"""
+(selector) => {{
+    const describe = {_ATTRS_JS};
+    return Array.from(document.querySelectorAll(selector)).map(describe);
+}}
+"""
+
+# 导航前记下旧详情的文字；框架复用同一个详情组件时，等文字变了才算新详情加载完
+_MARK_STALE_JS = "sel => { const w = document.querySelector(sel); if (w) w.dataset.staleText = w.innerText; }"
+_FRESH_JS = "sel => { const w = document.querySelector(sel); return !!w && w.dataset.staleText !== w.innerText; }"
+
+
+def _attr_priority(name: str) -> int:
+    if name == "href":
+        return 0
+    if name.startswith("data-") and "id" in name:
+        return 1
+    if name.startswith("data-") or name == "id":
+        return 2
+    return 3
+
+
+def url_template(detail_url: str, card_attrs: dict, all_attrs: list):
+    """
+    在卡片属性里找出现在详情 URL 里的那个值，返回 (属性名, URL 前缀, URL 后缀)。
+    只考虑在所有卡片上取值互不相同的属性（tabindex、role 之类的排除掉）。
+    """
+    for name in sorted(card_attrs, key=_attr_priority):
+        values = [a.get(name) for a in all_attrs]
+        if None in values or len(set(values)) != len(values):
+            continue
+        value = card_attrs[name]
+        # 值的首尾是字母数字时要求边界，免得 id=12 匹配到 URL 里的 123
+        head = r"(?<![0-9A-Za-z])" if value[0].isalnum() else ""
+        tail = r"(?![0-9A-Za-z])" if value[-1].isalnum() else ""
+        pattern = re.compile(head + re.escape(value) + tail)
+        matches = list(pattern.finditer(detail_url))
+        if matches:
+            m = matches[-1]
+            return name, detail_url[:m.start()], detail_url[m.end():]
+    return None
+
+
+class DetailTabPool:
+    """用 size 个后台标签页并行加载详情页"""
+
+    def __init__(self, page, card_selector: str, size=3, timeout=15000):
+        self.page = page
+        self.card_selector = card_selector
+        self.timeout = timeout
+        self.tabs = [page.context.new_page() for _ in range(max(1, size))]
+
+    def learn_urls(self):
+        """返回日历上每张卡片（与 page.locator(card_selector) 同序）的详情 URL；学不出来返回 None"""
+        tab = self.tabs[0]
+        try:
+            all_attrs = self.page.evaluate(_ALL_ATTRS_JS, self.card_selector)
+            if not all_attrs:
+                return None
+            tab.goto(self.page.url, wait_until="domcontentloaded")
+            wait_calendar(tab, self.card_selector, timeout=self.timeout)
+            card = tab.locator(self.card_selector).first
+            card_attrs = card.evaluate(_ATTRS_JS)
+            card.click()
+            wait_detail_page(tab, timeout=self.timeout)
+            detail_url = tab.url
+            # 离开这张详情，后面 goto 同一个 URL 时才能等到它重新加载
+            tab.goto("about:blank")
+        except Exception as e:
+            print(f"⚠️ 后台标签页打开详情失败: {e}")
+            return None
+
+        template = url_template(detail_url, card_attrs, all_attrs)
+        if template is None:
+            print(f"⚠️ 没能从卡片属性里找出详情 URL 规律: {detail_url}")
+            return None
+        name, prefix, suffix = template
+        print(f"详情 URL 规律: {prefix}{{{name}}}{suffix}")
+        return [f"{prefix}{attrs[name]}{suffix}" for attrs in all_attrs]
+
+    def load(self, urls):
+        """
+        按顺序 yield (i, tab)：tab 上已经是第 i 个 URL 的详情页（加载失败时 tab 为 None）。
+        调用方读完这个 tab 再取下一个，读的同时其余标签页在加载后面的详情。
+        """
+        queue = iter(enumerate(urls))
+        pending = deque()
+
+        def start(tab):
+            item = next(queue, None)
+            if item is None:
+                return
+            i, url = item
+            try:
+                tab.evaluate(_MARK_STALE_JS, DETAIL_WRAP)
+                tab.goto(url, wait_until="commit", timeout=self.timeout)
+                pending.append((i, tab, True))
+            except Exception as e:
+                print(f"   -> 打开详情失败: {e}")
+                pending.append((i, tab, False))
+
+        for tab in self.tabs:
+            start(tab)
+
+        while pending:
+            i, tab, ready = pending.popleft()
+            if ready:
+                try:
+                    with timed_wait("detail_open"):
+                        tab.wait_for_function(_FRESH_JS, arg=DETAIL_WRAP, timeout=self.timeout)
+                except PlaywrightTimeoutError:
+                    # 超时时页面上可能还是上一张卡片的详情，宁可跳过也不读错
+                    ready = False
+            yield i, (tab if ready else None)
+            start(tab)
+
+    def close(self):
+        for tab in self.tabs:
+            try:
+                tab.close()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,159 @@
+import json
+import os
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from run_metrics import stage
+
+# ---------------- 缓冲写入 Excel ----------------
+# 原来每写一行都要 read_excel + concat + to_excel 重写整个文件，行数一多就是 O(n²)。
+# ExcelSink 把行先放在内存里，攒够 batch_size 行或等待超过 flush_interval 秒才落盘一次，
+# 落盘在后台线程里做，浏览器循环不用等 xlsx 重写。
+# 已有的工作簿只在第一次落盘时读一次，之后一直保存在内存里；
+# 写盘先写临时文件再替换，程序崩溃最多丢失还没落盘的那一批。
+# on_flush(rows) 在每批成功落盘后由后台线程调用，用来同步查重索引之类的状态。
+# 退出时最后一批写不进去（比如文件一直被 Excel 占着）会重试几次，仍然失败就把这些行
+# 另存到 <文件名>.unsaved.jsonl 并提示，不会悄悄丢掉。
+
+_STOP = object()
+
+# 退出前最后一批落盘的重试次数和间隔（秒）
+STOP_RETRIES = 3
+STOP_RETRY_DELAY = 2.0
+
+
+class ExcelSink:
+    """批量、后台写入 Excel 的缓冲区"""
+
+    def __init__(self, path, columns=None, str_columns=(), batch_size=20, flush_interval=10.0,
+                 on_flush=None):
+        self.path = path
+        self.columns = list(columns) if columns else None
+        self.str_columns = tuple(str_columns)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.written = 0  # 本次运行已经落盘的行数
+        self.unsaved = 0  # 退出时没能写进工作簿、另存到 .unsaved.jsonl 的行数
+
+        self._queue = queue.Queue()
+        self._df = None
+        self._thread = threading.Thread(target=self._run, name="excel-sink", daemon=True)
+        self._thread.start()
+
+    # ---------------- 对外接口 ----------------
+
+    def add(self, row: dict):
+        """提交一行，立即返回"""
+        self._queue.put(row)
+
+    def close(self):
+        """把剩余的行全部落盘并停止后台线程"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------------- 后台线程 ----------------
+
+    def _run(self):
+        pending = []
+        first_pending_at = None
+
+        while True:
+            if pending:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - first_pending_at))
+            else:
+                timeout = None
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                if pending:
+                    self._flush_on_stop(pending)
+                return
+
+            if item is not None:
+                if not pending:
+                    first_pending_at = time.monotonic()
+                pending.append(item)
+
+            if not pending:
+                continue
+            if len(pending) >= self.batch_size or time.monotonic() - first_pending_at >= self.flush_interval:
+                if self._flush(pending):
+                    pending = []
+                else:
+                    # 写失败（比如文件被 Excel 占用）就保留这一批，下个周期再试
+                    print(f"   {len(pending)} 行暂存内存，稍后重试")
+                    first_pending_at = time.monotonic()
+
+    def _flush_on_stop(self, rows):
+        for attempt in range(1, STOP_RETRIES + 1):
+            if self._flush(rows):
+                return
+            if attempt < STOP_RETRIES:
+                print(f"   退出前落盘失败，{STOP_RETRY_DELAY:g} 秒后重试（{attempt}/{STOP_RETRIES}）")
+                time.sleep(STOP_RETRY_DELAY)
+
+        root, _ = os.path.splitext(self.path)
+        fallback = f"{root}.unsaved.jsonl"
+        try:
+            with open(fallback, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            print(f"❌ {len(rows)} 行没能写进 {self.path}，另存到 {fallback} 也失败，这些行已丢失: {e}")
+            for row in rows:
+                print(f"   {row}")
+            return
+        self.unsaved += len(rows)
+        print(f"❌ {len(rows)} 行没能写进 {self.path}，已另存到 {fallback}，请手工补录")
+
+    def _load(self):
+        if self._df is not None:
+            return
+        # 仓库里的 appointments.xlsx 可能是 0 字节占位文件，按不存在处理
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            converters = {c: str for c in self.str_columns}
+            self._df = pd.read_excel(self.path, converters=converters)
+        else:
+            self._df = pd.DataFrame(columns=self.columns)
+
+    @stage("excel_flush")
+    def _flush(self, rows) -> bool:
+        try:
+            self._load()
+            df_new = pd.DataFrame(rows)
+            if self.columns:
+                df_new = df_new.reindex(columns=self.columns)
+            df = pd.concat([self._df, df_new], ignore_index=True) if not self._df.empty else df_new
+
+            root, ext = os.path.splitext(self.path)
+            tmp_path = f"{root}.tmp{ext}"
+            df.to_excel(tmp_path, index=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ [落盘失败] {len(rows)} 行没有写进 {self.path}: {e}")
+            return False
+
+        self._df = df
+        self.written += len(rows)
+        print(f"💾 [落盘] 写入 {len(rows)} 行，共 {len(df)} 行")
+        if self.on_flush:
+            try:
+                self.on_flush(rows)
+            except Exception as e:
+                print(f"⚠️ on_flush 回调出错: {e}")
+        return True
@@ -0,0 +1,395 @@
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# ---------------- 本地模拟 EMS ----------------
+# 不碰线上 emsvip.linkedlife.cn 也能测爬虫吞吐、发现变慢：这里用标准库起一个假的 EMS 站点，
+# 登录页 → 左侧【预约】/【预约中心】菜单 → 日历视图，卡片数量、蓝色比例和各种延迟都可以配置。
+# 两种布局对应仓库里的几个脚本：
+#   modal:  a.fc-day-grid-event 里套 div.appointment-block-container，点开 .ant-modal 弹窗
+#           （appointment_html_optimized / appointment_async / appointment_to_excel(gemini)）
+#   detail: div.fc-event 卡片，点开跳到 div.appointment-detail-wrap 详情页，go_back 回日历
+#           （appointment_to_excel / appointment_to_excel(id)）
+# 日历数据由 /api/appointment/list 返回 JSON，--network 接口模式也能跑。
+# 同一个日期、同一个 seed 生成的数据每次都一样，方便前后对比。
+#
+#   python mock_ems.py --cards 200 --layout modal --modal-latency 150
+#   然后把脚本里的 URL 改成 http://127.0.0.1:8765/
+
+LAYOUTS = ("modal", "detail")
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗"
+GIVEN_NAMES = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华"
+SOURCES = ("美团", "大众点评", "老客介绍", "小红书", "抖音", "自然到店")
+DOCTORS = (("doc-1", "李医生"), ("doc-2", "王医生"), ("doc-3", "陈医生"),
+           ("doc-4", "赵医生"), ("doc-5", "周医生"), ("doc-6", "吴医生"))
+CONSULTANTS = ("小林", "小何", "小高")
+PROJECTS = ("洁牙", "补牙", "种植咨询", "正畸复诊", "拔牙", "美白")
+
+BLUE = "rgb(24, 144, 255)"      # 已到店
+ORANGE = "rgb(250, 173, 20)"    # 已预约
+GRAY = "rgb(191, 191, 191)"     # 已取消
+
+
+def generate_day(day: str, cards: int, blue_ratio: float, seed=0) -> list:
+    """生成某一天的预约列表（字段名和真实接口风格一致，calendar_capture 能直接识别）"""
+    rng = random.Random(f"{seed}:{day}")
+    d = datetime.strptime(day, "%Y-%m-%d")
+    records = []
+    for i in range(cards):
+        doctor_id, doctor_name = DOCTORS[i % len(DOCTORS)]
+        start = d.replace(hour=9) + timedelta(minutes=15 * rng.randrange(36))
+        end = start + timedelta(minutes=30)
+        arrived = rng.random() < blue_ratio
+        cancelled = not arrived and rng.random() < 0.2
+        records.append({
+            "id": i,
+            "customerName": rng.choice(SURNAMES) + "".join(rng.choice(GIVEN_NAMES) for _ in range(rng.choice((1, 2)))),
+            "memberNo": f"{d:%m%d}{i:04d}",
+            "startTime": start.strftime("%Y-%m-%d %H:%M"),
+            "endTime": end.strftime("%Y-%m-%d %H:%M"),
+            "timeText": f"{start:%Y/%m/%d %H:%M}-{end:%H:%M}",
+            "sourceName": rng.choice(SOURCES),
+            "statusName": "已到店" if arrived else ("已取消" if cancelled else "已预约"),
+            "arrived": arrived,
+            "color": BLUE if arrived else (GRAY if cancelled else ORANGE),
+            "doctorId": doctor_id,
+            "doctorName": doctor_name,
+            "consultant": rng.choice(CONSULTANTS),
+            "project": rng.choice(PROJECTS),
+        })
+    records.sort(key=lambda r: (r["doctorId"], r["startTime"], r["id"]))
+    return records
+
+
+PAGE_HTML = r"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>EMS</title>
+<style>
+body { margin: 0; font: 14px sans-serif; }
+.login { width: 320px; margin: 120px auto; display: flex; flex-direction: column; gap: 12px; }
+.layout { display: flex; height: 100vh; }
+.side-menu { width: 160px; margin: 0; padding: 0; list-style: none; background: #001529; color: #fff; }
+.side-menu li { padding: 12px 20px; cursor: pointer; }
+.side-menu .menu-sub { padding-left: 36px; background: #000c17; }
+#main { flex: 1; padding: 12px; overflow: hidden; }
+.view-tabs { display: flex; gap: 16px; margin-bottom: 8px; }
+.view-tabs .tab { cursor: pointer; padding: 4px 8px; }
+.fc-toolbar { display: flex; align-items: center; gap: 12px; }
+.fc-toolbar h2 { margin: 0; font-size: 18px; }
+.fc-view-container { height: 560px; overflow-y: auto; border: 1px solid #ddd; }
+.fc-resources { display: flex; }
+.fc-resource-col { flex: 1; min-width: 120px; border-right: 1px solid #eee; }
+.fc-col-head { padding: 4px; font-weight: bold; border-bottom: 1px solid #eee; }
+.fc-day-grid-event, .fc-event { display: block; height: 48px; margin: 4px; padding: 4px; color: #fff;
+    text-decoration: none; cursor: pointer; border-radius: 4px; }
+.ant-modal-mask { position: fixed; inset: 0; background: rgba(0, 0, 0, .45); }
+.ant-modal-wrap { position: fixed; inset: 0; display: flex; align-items: center; justify-content: center; }
+.ant-modal-content { width: 480px; background: #fff; border-radius: 4px; }
+.ant-modal-body { padding: 24px; line-height: 1.8; }
+.appointment-detail-wrap .item { display: flex; gap: 8px; line-height: 2; }
+</style>
+</head>
+<body>
+<div id="app"></div>
+<script>
+const CFG = __CONFIG__;
+const app = document.getElementById("app");
+const sleep = (ms) => new Promise((r) => setTimeout(r, ms));
+const esc = (s) => String(s).replace(/[&<>"]/g, (c) => ({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}[c]));
+let currentDay = CFG.day;
+let loadSeq = 0;
+
+function renderLogin() {
+    app.innerHTML = `<div class="login"><h1>EMS 管理系统</h1>
+        <input type="text" placeholder="公司"><input type="text" placeholder="账号">
+        <input type="password" placeholder="密码"><button id="login-btn">登 录</button></div>`;
+    document.getElementById("login-btn").onclick = async () => {
+        await sleep(CFG.login_latency);
+        localStorage.setItem("mockToken", "ok");
+        renderShell();
+    };
+}
+
+function renderShell() {
+    app.innerHTML = `<div class="layout"><ul class="side-menu">
+        <li class="menu-root"><span class="menu-title">预约</span></li>
+        <li class="menu-sub" style="display: none">预约中心</li>
+        <li class="menu-other"><span class="menu-title">客户</span></li>
+        </ul><div id="main"></div></div>`;
+    const sub = app.querySelector(".menu-sub");
+    app.querySelector(".menu-root").onclick = () => {
+        sub.style.display = sub.style.display === "none" ? "" : "none";
+    };
+    sub.onclick = () => { location.hash = "#/center"; };
+    route();
+}
+
+function route() {
+    if (!localStorage.getItem("mockToken")) return renderLogin();
+    const main = document.getElementById("main");
+    if (!main) return renderShell();
+    const detail = location.hash.match(/^#\/detail\/(\d+)/);
+    if (detail) return renderDetail(main, Number(detail[1]));
+    if (location.hash.startsWith("#/center")) return renderCenter(main);
+    main.innerHTML = "<p>欢迎使用</p>";
+}
+
+function renderCenter(main) {
+    main.innerHTML = `<div class="view-tabs"><div class="tab">列表视图</div><div class="tab">预约视图</div></div>
+        <div class="fc-toolbar"><button class="fc-prev-button">‹</button><h2></h2>
+        <button class="fc-next-button">›</button></div>
+        <div class="fc-view-container"><p class="fc-loading">加载中...</p></div>`;
+    main.querySelector(".fc-prev-button").onclick = () => shiftDay(main, -1);
+    main.querySelector(".fc-next-button").onclick = () => shiftDay(main, 1);
+    loadDay(main);
+}
+
+function shiftDay(main, delta) {
+    const d = new Date(currentDay + "T00:00:00Z");
+    d.setUTCDate(d.getUTCDate() + delta);
+    currentDay = d.toISOString().slice(0, 10);
+    loadDay(main);
+}
+
+async function loadDay(main) {
+    const seq = ++loadSeq;
+    const day = currentDay;
+    const box = main.querySelector(".fc-view-container");
+    box.innerHTML = '<p class="fc-loading">加载中...</p>';
+    const res = await fetch(`/api/appointment/list?date=${day}`);
+    const payload = await res.json();
+    if (seq !== loadSeq || !box.isConnected) return;
+    renderCards(box, payload.data.list);
+    // 标题在卡片渲染完之后才更新，翻页时等标题变化就等于等数据加载完
+    const [y, m, d] = day.split("-").map(Number);
+    main.querySelector(".fc-toolbar h2").textContent = `${y}年${m}月${d}日`;
+}
+
+function cardHtml(r) {
+    const time = r.startTime.slice(11);
+    if (CFG.layout === "detail") {
+        return `<div class="fc-event ${r.arrived ? "fc-arrived" : ""}" data-idx="${r.id}"
+            style="background-color: ${r.color}"><span class="fc-time">${time}</span>
+            <span class="fc-title">${esc(r.customerName)}</span></div>`;
+    }
+    const colour = r.arrived ? "blue" : (r.color === CFG.gray ? "gray" : "orange");
+    return `<a class="fc-day-grid-event" data-idx="${r.id}" style="background-color: ${r.color}">
+        <div class="appointment-block-container ${colour}"><span class="time">${time}</span>
+        <span class="user-name">${esc(r.customerName)}</span></div></a>`;
+}
+
+function renderCards(box, list) {
+    const columns = new Map();
+    for (const r of list) {
+        if (!columns.has(r.doctorId)) columns.set(r.doctorId, []);
+        columns.get(r.doctorId).push(r);
+    }
+    box.innerHTML = '<div class="fc-resources">' + Array.from(columns.entries()).map(([id, rows]) =>
+        `<div class="fc-resource-col" data-resource-id="${id}"><div class="fc-col-head">${rows[0].doctorName}</div>`
+        + rows.map(cardHtml).join("") + "</div>").join("") + "</div>";
+    box.querySelectorAll("[data-idx]").forEach((el) => {
+        el.onclick = (ev) => { ev.preventDefault(); openCard(Number(el.dataset.idx)); };
+    });
+}
+
+async function fetchDetail(idx) {
+    const res = await fetch(`/api/visit/detail?date=${currentDay}&id=${idx}`);
+    return res.json();
+}
+
+async function openCard(idx) {
+    if (CFG.layout === "detail") {
+        location.hash = `#/detail/${idx}`;
+        return;
+    }
+    const r = await fetchDetail(idx);
+    closeModal();
+    const root = document.createElement("div");
+    root.className = "ant-modal-root";
+    root.innerHTML = `<div class="ant-modal-mask"></div><div class="ant-modal-wrap"><div class="ant-modal">
+        <div class="ant-modal-content"><div class="ant-modal-body">
+        <div class="header-info"><div>${esc(r.customerName)}</div><div>${r.memberNo}</div></div>
+        <div>预约时间：${r.timeText}</div><div>客户来源：${esc(r.sourceName)}</div>
+        <div>医生：${r.doctorName}</div><div>咨询师：${r.consultant}</div>
+        <div>项目：${r.project}</div><div>状态：${r.statusName}</div>
+        </div></div></div></div>`;
+    document.body.appendChild(root);
+}
+
+function closeModal() {
+    document.querySelectorAll(".ant-modal-root").forEach((n) => n.remove());
+}
+
+async function renderDetail(main, idx) {
+    main.innerHTML = '<p class="fc-loading">加载中...</p>';
+    const r = await fetchDetail(idx);
+    const item = (label, value) =>
+        `<div class="item"><span class="label">${label}：</span><span class="content">${esc(value)}</span></div>`;
+    main.innerHTML = `<div class="appointment-detail-wrap">
+        <div class="member">会员号 <span class="ng-star-inserted">${r.memberNo}01</span></div>
+        ${item("客户", r.customerName)}${item("预约时间", r.timeText)}${item("医生", r.doctorName)}
+        ${item("咨询师", r.consultant)}${item("项目", r.project)}${item("客户来源", r.sourceName)}
+        ${item("状态", r.arrived ? "完成" : "待确认")}</div>`;
+}
+
+document.addEventListener("keydown", (e) => { if (e.key === "Escape") closeModal(); });
+window.addEventListener("hashchange", route);
+route();
+</script>
+</body>
+</html>
+"""
+
+
+class MockEMS:
+    """
+    模拟站点。可以当上下文管理器在后台线程里跑：
+        with MockEMS(cards=100, layout="detail") as server:
+            module.URL = server.url
+    延迟单位都是秒：api_latency 日历接口，modal_latency 弹窗/详情接口，login_latency 点登录后。
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, cards=60, blue_ratio=0.6, layout="modal",
+                 api_latency=0.3, modal_latency=0.15, login_latency=0.2, day=None, seed=0):
+        if layout not in LAYOUTS:
+            raise ValueError(f"layout 只能是 {LAYOUTS}")
+        self.cards = cards
+        self.blue_ratio = blue_ratio
+        self.layout = layout
+        self.api_latency = api_latency
+        self.modal_latency = modal_latency
+        self.login_latency = login_latency
+        self.day = day or date.today().isoformat()
+        self.seed = seed
+        self._days = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def records(self, day: str) -> list:
+        with self._lock:
+            if day not in self._days:
+                self._days[day] = generate_day(day, self.cards, self.blue_ratio, self.seed)
+            return self._days[day]
+
+    def record(self, day: str, record_id: int):
+        return next((r for r in self.records(day) if r["id"] == record_id), None)
+
+    def expected_arrived(self, day=None) -> int:
+        """某天蓝色（已到店）卡片数，跑完可以和导出的行数对一下"""
+        return sum(1 for r in self.records(day or self.day) if r["arrived"])
+
+    def page_html(self) -> str:
+        config = {"layout": self.layout, "day": self.day, "gray": GRAY,
+                  "login_latency": int(self.login_latency * 1000)}
+        return PAGE_HTML.replace("__CONFIG__", json.dumps(config))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, body: bytes, content_type: str, status=200):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, payload, status=200):
+                self._send(json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                           "application/json; charset=utf-8", status)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                day = query.get("date", server.day)
+
+                if parts.path == "/api/appointment/list":
+                    time.sleep(server.api_latency)
+                    self._json({"code": 0, "data": {"list": server.records(day)}})
+                elif parts.path == "/api/visit/detail":
+                    time.sleep(server.modal_latency)
+                    try:
+                        record = server.record(day, int(query["id"]))
+                    except (KeyError, ValueError):
+                        record = None
+                    if record is None:
+                        self._json({"code": 404, "message": "not found"}, status=404)
+                    else:
+                        self._json(record)
+                elif parts.path.startswith("/api/"):
+                    self._json({"code": 404, "message": "not found"}, status=404)
+                else:
+                    self._send(server.page_html().encode("utf-8"), "text/html; charset=utf-8")
+
+        return Handler
+
+    def serve_forever(self):
+        """前台运行（命令行启动时用），Ctrl+C 退出"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-ems", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 EMS 站点")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cards", type=int, default=60, help="每天的预约卡片数")
+    parser.add_argument("--blue-ratio", type=float, default=0.6, help="蓝色（已到店）卡片比例")
+    parser.add_argument("--layout", choices=LAYOUTS, default="modal",
+                        help="modal: 弹窗布局；detail: 详情页布局")
+    parser.add_argument("--api-latency", type=int, default=300, help="日历接口延迟（毫秒）")
+    parser.add_argument("--modal-latency", type=int, default=150, help="弹窗/详情接口延迟（毫秒）")
+    parser.add_argument("--login-latency", type=int, default=200, help="登录延迟（毫秒）")
+    parser.add_argument("--day", help="日历默认显示的日期（YYYY-MM-DD），默认今天")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockEMS(args.host, args.port, cards=args.cards, blue_ratio=args.blue_ratio, layout=args.layout,
+                     api_latency=args.api_latency / 1000, modal_latency=args.modal_latency / 1000,
+                     login_latency=args.login_latency / 1000, day=args.day, seed=args.seed)
+    print(f"模拟 EMS 已启动: {server.url} （{args.layout} 布局，每天 {args.cards} 个卡片）")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
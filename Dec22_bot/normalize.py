@@ -0,0 +1,12 @@
+import pandas as pd
+
+# ---------------- 字段值归一 ----------------
+# 查重时会员号、日期等字段可能是 None、NaN、数字或带空格的文字，
+# 统一转成去掉首尾空格的文字再比较；空值是 ""。
+# appointment_index（内存查重索引）和 appointment_store（SQLite 预约库）共用。
+
+
+def normalize(value) -> str:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value).strip()
@@ -0,0 +1,118 @@
+import functools
+import inspect
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+# ---------------- 分阶段计时 ----------------
+# 原来只有“✅ [写入成功]”这类 print，跑得慢时分不清时间花在登录、翻页、滚动、弹窗还是写 Excel。
+# 给各阶段函数加上 @stage(...)，每次调用的耗时和成败记在 STAGE_LOG 里；
+# 结束时 write_report() 把各阶段和各种等待（传入 waits.WAIT_LOG）的次数、总计、p50/p95/最长写成 JSON。
+# stream_metrics() 打开后，每个阶段结束时再实时输出一行 JSON，方便边跑边看或 tail -f。
+
+# 名称 -> [(耗时秒, 是否成功), ...]，和 WAIT_LOG 同样的格式
+STAGE_LOG = defaultdict(list)
+
+_started = time.perf_counter()
+_started_at = datetime.now()
+_stream = None
+_stream_lock = threading.Lock()
+
+
+def stream_metrics(target="-"):
+    """实时输出每个阶段的耗时：target 为 "-" 时打印到 stderr，否则追加写入该文件"""
+    global _stream
+    _stream = sys.stderr if target == "-" else open(target, "a", encoding="utf-8")
+
+
+def _record(name: str, secs: float, ok: bool):
+    STAGE_LOG[name].append((secs, ok))
+    if _stream is not None:
+        line = json.dumps({"t": round(time.perf_counter() - _started, 3), "stage": name,
+                           "secs": round(secs, 4), "ok": ok}, ensure_ascii=False)
+        with _stream_lock:
+            _stream.write(line + "\n")
+            _stream.flush()
+
+
+@contextmanager
+def timed_stage(name: str):
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        _record(name, time.perf_counter() - start, ok)
+
+
+def stage(name=None):
+    """装饰器：记录函数每次调用的耗时，普通函数和 async 函数都可以用"""
+    def decorate(fn):
+        label = name or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timed_stage(label):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed_stage(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def trim_logs(*logs, keep=5000):
+    """常驻进程里每项只保留最近 keep 条记录（STAGE_LOG 加上传入的 WAIT_LOG 等），内存不会一直涨"""
+    for log in (STAGE_LOG, *logs):
+        for records in log.values():
+            del records[:-keep]
+
+
+def percentile(values, q: float) -> float:
+    """最近秩百分位数，values 为空时返回 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))  # ceil(n * q / 100)
+    return ordered[int(rank) - 1]
+
+
+def summarize(records) -> dict:
+    secs = [t for t, _ in records]
+    return {
+        "count": len(records),
+        "failed": sum(1 for _, ok in records if not ok),
+        "total": round(sum(secs), 4),
+        "p50": round(percentile(secs, 50), 4),
+        "p95": round(percentile(secs, 95), 4),
+        "max": round(max(secs, default=0.0), 4),
+    }
+
+
+def write_report(path: str, counts=None, waits=None):
+    """写出本次运行的计时报告；counts 是调用方想一起记录的计数（写入行数等），waits 传 WAIT_LOG"""
+    report = {
+        "started_at": _started_at.isoformat(timespec="seconds"),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "elapsed": round(time.perf_counter() - _started, 3),
+        "counts": counts or {},
+        "stages": {name: summarize(records) for name, records in STAGE_LOG.items()},
+        "waits": {name: summarize(records) for name, records in (waits or {}).items()},
+    }
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"计时报告已写入 {path}")
+    except OSError as e:
+        print(f"⚠️ 计时报告写入失败: {e}")
+    return report
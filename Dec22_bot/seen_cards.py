@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+from datetime import date, timedelta
+
+# ---------------- 已导出卡片的指纹集合 ----------------
+# 查重原来要等卡片点开、弹窗提取完才做，已经导出过的卡片照样要点击、等待、提取、Escape 一遍。
+# SeenCards 跨运行保存“哪天的哪张卡片已经导出（或确认已存在）”，用卡片自身的指纹
+# （姓名、时间段、所在列、状态 class，见 card_snapshot.card_fingerprint）在点击之前就能判断，
+# 同一天重跑一遍一个弹窗都不用打开。卡片变蓝、改时间等会改变指纹，照常处理。
+# 和 Checkpoint 的区别：Checkpoint 是单次运行的断点日志，不带 --resume 就清空；这里一直保留，
+# 只在加载时丢掉 retention_days 天以前的记录，文件不会无限变大。
+
+SEEN_RETENTION_DAYS = 62
+
+
+class SeenCards:
+    """按日期保存的已导出卡片指纹，追加写 JSONL"""
+
+    def __init__(self, path: str, retention_days=SEEN_RETENTION_DAYS, rescan=False):
+        """rescan=True 时不读以前的记录（所有卡片重新点开），但本次完成的卡片照样记下来"""
+        self.path = path
+        self._days = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path) and not rescan:
+            self._load(retention_days)
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() > 0 and not self._ends_with_newline():
+            # 上次可能停在半行
+            self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _load(self, retention_days):
+        cutoff = (date.today() - timedelta(days=retention_days)).isoformat()
+        dropped = False
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    day, fp = entry["day"], entry["fp"]
+                except (ValueError, KeyError, TypeError):
+                    dropped = True
+                    continue
+                if day < cutoff:
+                    dropped = True
+                    continue
+                self._days.setdefault(day, set()).add(fp)
+        if dropped:
+            self._compact()
+
+    def _compact(self):
+        """重写文件，去掉过期和损坏的行"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for day, fps in sorted(self._days.items()):
+                for fp in sorted(fps):
+                    f.write(json.dumps({"day": day, "fp": fp}) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def contains(self, day: str, fingerprint: str) -> bool:
+        return fingerprint in self._days.get(day, ())
+
+    def add(self, day: str, fingerprint: str):
+        if not fingerprint:
+            return
+        with self._lock:
+            fps = self._days.setdefault(day, set())
+            if fingerprint in fps:
+                return
+            fps.add(fingerprint)
+            self._file.write(json.dumps({"day": day, "fp": fingerprint}) + "\n")
+            self._file.flush()
+
+    def count(self, day: str) -> int:
+        return len(self._days.get(day, ()))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
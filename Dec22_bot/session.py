@@ -0,0 +1,51 @@
+import os
+
+from waits import timed_wait
+
+# ---------------- 登录状态复用 ----------------
+# 登录是每次运行固定的最大开销（打开登录页、输入公司/账号/密码、等菜单最多 30 秒）。
+# 登录成功后把浏览器 context 的 storage_state（cookie + localStorage）存到文件，
+# 下次启动用它创建 context，直接打开系统；只有检测到会话过期（出现登录框）时才重新登录。
+# 这个文件里是登录凭证，不要提交到仓库。
+
+MENU_SELECTOR = "text=预约"
+LOGIN_FORM_SELECTOR = "input[type='password']"
+
+
+def saved_state(state_path: str):
+    """有保存的登录状态就返回路径，给 browser.new_context(storage_state=...) 用"""
+    return state_path if state_path and os.path.exists(state_path) else None
+
+
+def is_logged_in(page, timeout=15000) -> bool:
+    """等菜单或登录框其中之一出现：出现菜单说明会话有效"""
+    with timed_wait("session_check"):
+        target = page.locator(MENU_SELECTOR).or_(page.locator(LOGIN_FORM_SELECTOR))
+        try:
+            target.first.wait_for(state="visible", timeout=timeout)
+        except Exception:
+            return False
+        return not page.locator(LOGIN_FORM_SELECTOR).first.is_visible()
+
+
+def start_session(page, url: str, login, state_path: str, force_login=False):
+    """
+    复用已保存的登录状态进入系统；没有保存、已过期或 force_login 时调用 login(page) 重新登录，
+    登录成功后把新的状态写回 state_path。
+    """
+    if not force_login and saved_state(state_path):
+        print("正在复用已保存的登录状态...")
+        try:
+            page.goto(url, wait_until="domcontentloaded", timeout=30000)
+            if is_logged_in(page):
+                print("会话有效，跳过登录。")
+                return
+        except Exception as e:
+            print(f"⚠️ 打开系统失败: {e}")
+        print("登录状态已过期，重新登录...")
+
+    login(page)
+
+    if page.locator(MENU_SELECTOR).first.is_visible():
+        page.context.storage_state(path=state_path)
+        print(f"登录状态已保存到 {state_path}")
@@ -0,0 +1,114 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+# ---------------- 等待层 ----------------
+# 替代脚本里写死的 time.sleep / wait_for_timeout：每种等待都等一个具体的 DOM 或网络条件，
+# 条件满足就立刻返回，超时才算失败。
+# 每次等待的真实耗时都记在 WAIT_LOG 里，结束时 print_wait_summary() 打印出来，
+# 可以看到时间到底花在哪一步。
+
+CALENDAR_CONTAINER = ".appointment-block-container, .fc-view-container"
+MODAL_SELECTOR = ".ant-modal-content"
+
+# 名称 -> [(耗时秒, 是否成功), ...]
+WAIT_LOG = defaultdict(list)
+
+
+@contextmanager
+def timed_wait(name: str):
+    """记录一段等待的耗时；超时异常照常抛出，但也会记一笔失败"""
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except PlaywrightTimeoutError:
+        ok = False
+        raise
+    finally:
+        WAIT_LOG[name].append((time.perf_counter() - start, ok))
+
+
+def wait_logged_in(page, timeout=30000):
+    """登录后等左侧菜单出现"""
+    with timed_wait("login"):
+        page.wait_for_selector("text=预约", timeout=timeout)
+
+
+def wait_menu_item(page, text: str, timeout=10000, exact=False):
+    """等某个菜单项可见（点击一级菜单后等二级菜单展开）；exact=True 时按完整文字匹配"""
+    with timed_wait(f"menu:{text}"):
+        if exact:
+            item = page.get_by_text(text, exact=True).first
+        else:
+            item = page.locator("li").filter(has_text=text).first
+        item.wait_for(state="visible", timeout=timeout)
+        return item
+
+
+def wait_center_loaded(page, timeout=15000):
+    """点击预约中心后，等【预约视图】切换按钮或日历容器其中之一出现"""
+    with timed_wait("center"):
+        target = page.get_by_text("预约视图").or_(page.locator(CALENDAR_CONTAINER))
+        target.first.wait_for(state="visible", timeout=timeout)
+
+
+def wait_calendar(page, card_selector: str, timeout=20000, grace=3000) -> int:
+    """
+    等日历渲染完成，返回卡片数量。
+    先等日历容器出现；卡片没有马上出来时等网络空闲后再给一次机会，
+    当天确实没有预约也不会一直空等。
+    """
+    has_cards = "sel => document.querySelectorAll(sel).length > 0"
+    with timed_wait("calendar"):
+        page.wait_for_selector(CALENDAR_CONTAINER, timeout=timeout)
+        try:
+            page.wait_for_function(has_cards, arg=card_selector, timeout=grace)
+        except PlaywrightTimeoutError:
+            try:
+                page.wait_for_load_state("networkidle", timeout=timeout)
+                page.wait_for_function(has_cards, arg=card_selector, timeout=grace)
+            except PlaywrightTimeoutError:
+                pass
+        return page.locator(card_selector).count()
+
+
+def wait_modal_open(page, timeout=5000):
+    with timed_wait("modal_open"):
+        modal = page.locator(MODAL_SELECTOR).first
+        modal.wait_for(state="visible", timeout=timeout)
+        return modal
+
+
+def wait_modal_closed(page, timeout=5000):
+    """Escape 之后等弹窗消失（隐藏或从 DOM 移除都算）"""
+    try:
+        with timed_wait("modal_close"):
+            page.locator(MODAL_SELECTOR).first.wait_for(state="hidden", timeout=timeout)
+    except PlaywrightTimeoutError:
+        # 关不掉也不要卡住整个流程，下一张卡片点击前会再按 Escape
+        pass
+
+
+def wait_detail_page(page, timeout=15000):
+    with timed_wait("detail_open"):
+        page.wait_for_selector("div.appointment-detail-wrap", timeout=timeout)
+
+
+def wait_back_on_calendar(page, card_selector: str, timeout=15000):
+    """go_back 之后等卡片重新出现"""
+    with timed_wait("detail_back"):
+        page.wait_for_selector(card_selector, timeout=timeout)
+
+
+def print_wait_summary():
+    if not WAIT_LOG:
+        return
+    print("\n---- 等待耗时统计 ----")
+    for name, records in sorted(WAIT_LOG.items(), key=lambda kv: -sum(t for t, _ in kv[1])):
+        total = sum(t for t, _ in records)
+        failed = sum(1 for _, ok in records if not ok)
+        print(f"{name:<16} 次数 {len(records):>4} | 总计 {total:7.2f}s | 平均 {total / len(records):6.2f}s"
+              f" | 最长 {max(t for t, _ in records):6.2f}s" + (f" | 超时 {failed}" if failed else ""))
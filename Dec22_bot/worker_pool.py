@@ -0,0 +1,88 @@
+import queue
+import threading
+import traceback
+
+# ---------------- 多 worker 并行 ----------------
+# 多个 worker 各自开一个浏览器 context（共用已保存的登录状态），每个只处理分给自己的那一片卡片，
+# 提取出的数据全部交给同一个 SingleWriter，由它在单独线程里做查重和写入预约库，
+# 所以查重和写入始终在同一个线程里串行执行。
+# Playwright 的同步 API 不能跨线程共享，每个 worker 线程要自己 sync_playwright()。
+
+MAX_WORKERS = 4  # 并发上限，再多网站那边容易限流
+
+_STOP = object()
+
+
+def shard_cards(cards, worker_id: int, workers: int, by="index") -> list:
+    """
+    把卡片分给各个 worker，各 worker 之间不重叠。
+    每个 worker 看到的卡片顺序可能不同，所以先按指纹/列名排序再分，保证分法一致。
+    by="index": 按卡片轮流分；by="column": 按医生列整列分。
+    """
+    if workers <= 1:
+        return list(cards)
+    if by == "column":
+        columns = sorted({str(c.get("column", "")) for c in cards})
+        mine = {col for i, col in enumerate(columns) if i % workers == worker_id}
+        return [c for c in cards if str(c.get("column", "")) in mine]
+    ordered = sorted(cards, key=lambda c: c["fingerprint"])
+    return [c for i, c in enumerate(ordered) if i % workers == worker_id]
+
+
+class SingleWriter:
+    """唯一的写入线程：worker 调 submit 就返回，store(raw_data) 在写入线程里串行执行"""
+
+    def __init__(self, store):
+        self.store = store
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="single-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, raw_data: dict):
+        self._queue.put(raw_data)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            try:
+                self.store(item)
+            except Exception as e:
+                print(f"   -> 写入出错: {e}")
+
+
+def run_pool(worker_fn, workers: int, store):
+    """
+    启动 workers 个线程执行 worker_fn(worker_id, workers, emit)，emit 把数据交给唯一的写入者。
+    等所有 worker 结束、写入队列清空后返回。
+    """
+    workers = max(1, min(workers, MAX_WORKERS))
+    print(f"启动 {workers} 个并行 worker...")
+
+    def guarded(worker_id, emit):
+        try:
+            worker_fn(worker_id, workers, emit)
+        except Exception:
+            print(f"⚠️ worker-{worker_id} 异常退出:")
+            traceback.print_exc()
+
+    with SingleWriter(store) as writer:
+        threads = [
+            threading.Thread(target=guarded, args=(i, writer.submit), name=f"worker-{i}")
+            for i in range(workers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
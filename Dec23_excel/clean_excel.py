@@ -1,136 +1,521 @@
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pandas as pd
 import numpy as np
+from pandas.io.parsers import TextParser
+
+from parse_cache import cached_read
+from result_writer import ResultWriter
+
+# --- 配置区域 ---
+# 根据你的截图，示例产品为"其他"，我已将其加入列表。
+# 请在此处补全所有合规的9个产品名称
+VALID_PRODUCTS = [
+    "其他", "保妥适单次", "乔雅登", "酷塑", "标签5", 
+    "标签6", "标签7", "标签8", "标签9"
+]
+
+# --- 校验规则 ---
+# 原来用 df.apply(validate_row, axis=1) 逐行校验，每行都要在 Python 里调 pd.to_datetime / float / str，
+# 几十万行要跑几分钟。现在每条规则对整列算出一个布尔掩码，命中的行在对应的位上置 1，
+# 全部规则算完后再按位组合成“数据校验结果”文字（不同的组合只有几十种，每种只拼一次）。
+# 顺序就是原来 errors 列表追加的顺序，输出文字和逐行校验完全一致。
+ERR_DATE_EMPTY = 1 << 0
+ERR_DATE_FORMAT = 1 << 1
+ERR_AMOUNT_RANGE = 1 << 2
+ERR_AMOUNT_TYPE = 1 << 3
+ERR_CARD_EMPTY = 1 << 4
+ERR_CARD_LENGTH = 1 << 5
+ERR_SOURCE_LENGTH = 1 << 6
+ERR_CONSULTANT_LENGTH = 1 << 7
+ERR_PRODUCT_EMPTY = 1 << 8
+ERR_PRODUCT_INVALID = 1 << 9
+
+ERROR_MESSAGES = {
+    ERR_DATE_EMPTY: "消费日期为空",
+    ERR_DATE_FORMAT: "消费日期格式错误",
+    ERR_AMOUNT_RANGE: "业绩金额超出范围 (-100万 到 +100万)",
+    ERR_AMOUNT_TYPE: "业绩金额必须是数字",
+    ERR_CARD_EMPTY: "客户卡号为空",
+    ERR_CARD_LENGTH: "客户卡号长度超过50位",
+    ERR_SOURCE_LENGTH: "渠道来源长度超过50位",
+    ERR_CONSULTANT_LENGTH: "咨询师名称长度超过10位",
+    ERR_PRODUCT_EMPTY: "消费产品为空",
+    ERR_PRODUCT_INVALID: "产品名称不合规",
+}
+
+AMOUNT_LIMIT = 1000000
+CARD_MAX_LEN = 50
+SOURCE_MAX_LEN = 50
+CONSULTANT_MAX_LEN = 10
+
+OUTPUT_PREFIX = '处理结果_'  # a.xlsx 的结果写到同目录下的 处理结果_a.xlsx
+SHEET_NAME = '处理结果'
+SUMMARY_FILENAME = '处理汇总.xlsx'  # 批量模式的汇总表
+
+# 处理结果表的列宽，方便阅读
+COLUMN_WIDTHS = {
+    'A:A': 15,  # 消费日期
+    'B:B': 12,  # 业绩金额
+    'C:C': 20,  # 客户卡号
+    'G:G': 40,  # 校验结果列(假设在G列)
+}
+
+# 流式模式每块读多少行；峰值内存取决于这个数，和文件大小无关
+CHUNK_SIZE = 20000
+
+# --- 读入类型 ---
+# 读 Excel 时就按列指定类型，不再读完后逐行修补：
+#   - 客户卡号按文字读（数字单元格转成完整的整数文字），不会先变成 float 丢掉 15 位以后的数字；
+#   - 消费产品 / 渠道来源 / 咨询师 只有几十个不同的值，用 category 存，内存小，
+#     长度、白名单这些检查只对每个不同的值算一次。这几列读完再转 category：
+#     读的时候就指定 category 的话，同一列里既有文字又有数字（咨询师写成 5）会读取失败；
+#   - 消费日期、业绩金额在 parse_values 里各解析一次，校验和格式化共用同一份结果。
+SCHEMA = {
+    '客户卡号': 'str',
+    '消费产品': 'category',
+    '渠道来源': 'category',
+    '咨询师': 'category',
+}
+
+
+def _column(df, name):
+    """取一列；表里没有这一列时按全空处理（和原来 row.get 返回 None 一样）"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(None, index=df.index, dtype=object)
+
+
+def _by_value(col, func, fill):
+    """
+    func(文字) -> 同样长度的结果，对整列算一次，空值的位置填 fill。
+    category 列只对每个不同的值算一次，再按编码展开到每一行。
+    """
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        per_category = np.asarray(func(col.cat.categories.astype(str)))
+        return np.append(per_category, fill)[col.cat.codes.to_numpy()]
+    return np.where(col.isna().to_numpy(), fill, np.asarray(func(col.astype(str))))
+
+
+def _too_long(col, limit):
+    """非空且转成文字后超过 limit 个字"""
+    return _by_value(col, lambda text: text.str.len() > limit, False)
+
+
+def parse_values(df):
+    """
+    消费日期、业绩金额各解析一次，校验和格式化共用：
+    {'dates': 日期, 'date_bad': 有值但不是日期, 'amounts': 金额, 'amount_bad': 有值但不是数字}
+    整列解析失败的少数行再逐个按原来逐行校验的方式确认一遍（比如 '1_000' 整列解析不了，float 可以）。
+    """
+    date_col = _column(df, '消费日期')
+    dates = pd.to_datetime(date_col, errors='coerce', format='mixed')
+    date_bad = np.zeros(len(df), dtype=bool)
+    suspect = np.flatnonzero((date_col.notna() & dates.isna()).to_numpy())
+    if len(suspect):
+        dates = dates.copy()
+        for i in suspect:
+            try:
+                dates.iloc[i] = pd.to_datetime(date_col.iloc[i])
+            except Exception:
+                date_bad[i] = True
+
+    amount_col = _column(df, '业绩金额')
+    amounts = pd.to_numeric(amount_col, errors='coerce').astype(float)
+    amount_bad = np.zeros(len(df), dtype=bool)
+    suspect = np.flatnonzero((amount_col.notna() & amounts.isna()).to_numpy())
+    if len(suspect):
+        for i in suspect:
+            try:
+                amounts.iloc[i] = float(amount_col.iloc[i])
+            except ValueError:
+                amount_bad[i] = True
+
+    return {'dates': dates, 'date_bad': date_bad, 'amounts': amounts, 'amount_bad': amount_bad}
+
+
+def validate_frame(df, parsed=None):
+    """整列校验，返回每行的“数据校验结果”文字（空字符串表示通过）"""
+    return render_errors(validate_codes(df, parsed), df.index)
+
+
+def validate_codes(df, parsed=None):
+    """整列校验，返回每行的错误位掩码（0 表示通过）；parsed 是 parse_values 的结果"""
+    if parsed is None:
+        parsed = parse_values(df)
+    codes = np.zeros(len(df), dtype=np.int64)
+
+    def flag(mask, bit):
+        codes[np.asarray(mask, dtype=bool)] |= bit
+
+    # 1. 消费日期 (必填, 能转换为日期)
+    flag(_column(df, '消费日期').isna(), ERR_DATE_EMPTY)
+    flag(parsed['date_bad'], ERR_DATE_FORMAT)
+
+    # 2. 业绩金额 (非必填, 数字且在 ±100万 以内)
+    # float('nan')、'inf' 这类能转成数字但不在范围内的也算超出范围
+    amount_present = _column(df, '业绩金额').notna().to_numpy()
+    in_range = parsed['amounts'].between(-AMOUNT_LIMIT, AMOUNT_LIMIT).to_numpy()
+    flag(amount_present & ~parsed['amount_bad'] & ~in_range, ERR_AMOUNT_RANGE)
+    flag(parsed['amount_bad'], ERR_AMOUNT_TYPE)
+
+    # 3. 客户卡号 (必填, 长度<=50)
+    card_col = _column(df, '客户卡号')
+    card_empty = _by_value(card_col, lambda text: (text.str.lower() == 'nan') | (text.str.strip() == ''), True)
+    flag(card_empty, ERR_CARD_EMPTY)
+    flag(~card_empty & _too_long(card_col, CARD_MAX_LEN), ERR_CARD_LENGTH)
+
+    # 4. 渠道来源 (非必填, 长度<=50)
+    flag(_too_long(_column(df, '渠道来源'), SOURCE_MAX_LEN), ERR_SOURCE_LENGTH)
+
+    # 5. 咨询师 (非必填, 长度<=10)
+    flag(_too_long(_column(df, '咨询师'), CONSULTANT_MAX_LEN), ERR_CONSULTANT_LENGTH)
+
+    # 6. 消费产品 (必填, 必须在白名单内)
+    product_col = _column(df, '消费产品')
+    product_empty = _by_value(product_col, lambda text: text.str.strip() == '', True)
+    product_known = _by_value(product_col, lambda text: text.str.strip().isin(VALID_PRODUCTS), False)
+    flag(product_empty, ERR_PRODUCT_EMPTY)
+    flag(~product_empty & ~product_known, ERR_PRODUCT_INVALID)
+
+    return codes
+
+
+def render_errors(codes, index=None):
+    """按位掩码 -> 校验结果文字，每种组合只拼一次"""
+    uniques, inverse = np.unique(codes, return_inverse=True)
+    texts = np.array(
+        ["; ".join(msg for bit, msg in ERROR_MESSAGES.items() if code & bit) for code in uniques],
+        dtype=object,
+    )
+    return pd.Series(texts[inverse.reshape(-1)], index=index, dtype=object)
+
+
+def format_frame(df, parsed=None):
+    """数据清洗与格式化 (Formatting)，原地修改 df；parsed 是 parse_values 的结果（校验时已经解析过）"""
+    if parsed is None:
+        parsed = parse_values(df)
+
+    # 1. 日期格式化：无论原数据是 "2025-11-30 18:46:31" 还是其他，统一转为 "yyyy/mm/dd"
+    # 无法转换的是 NaT，输出为空
+    if '消费日期' in df.columns:
+        df['消费日期'] = parsed['dates'].dt.strftime('%Y/%m/%d')
+    
+    # 2. 金额格式化：保留两位小数
+    if '业绩金额' in df.columns:
+        df['业绩金额'] = parsed['amounts'].round(2)
+
+    # 3. 客户卡号：按文字读入，不会变成 2.50822E+11；文字本身写成 "123.0" 的照旧去掉 .0
+    # 空值先换成 ""：老版本 pandas 的 astype(str) 会把 NaN 变成文字 "nan"
+    if '客户卡号' in df.columns:
+        card = df['客户卡号']
+        df['客户卡号'] = card.where(card.notna(), "").astype(str).str.removesuffix('.0')
+
+
+def read_input(file_path, use_cache=True):
+    """整表读入（文件没变时直接读解析缓存，见 parse_cache）"""
+    if use_cache:
+        return cached_read(file_path, lambda: _parse_excel(file_path), variant=repr(SCHEMA))
+    return _parse_excel(file_path)
+
+
+def _read_dtypes(columns):
+    """
+    SCHEMA 里读的时候就要指定的类型（category 除外，见 _apply_categories），
+    SCHEMA 按清洗后的列名写，读的时候要换回表头原来的写法（可能带空格）
+    """
+    return {
+        raw: SCHEMA[raw.strip()] for raw in columns
+        if isinstance(raw, str) and raw.strip() in SCHEMA and SCHEMA[raw.strip()] != 'category'
+    }
+
+
+def _apply_categories(df):
+    """读完、表头清洗后，把 SCHEMA 里的 category 列转过去（文字和数字混着的列也能转）"""
+    for name, dtype in SCHEMA.items():
+        if dtype == 'category' and name in df.columns:
+            df[name] = df[name].astype('category')
+    return df
+
+
+def _parse_excel(file_path):
+    header = pd.read_excel(file_path, nrows=0).columns
+    df = pd.read_excel(file_path, dtype=_read_dtypes(header))
+    # 清洗表头：去除表头可能存在的空格，防止 '消费日期 ' 这种匹配不到的情况
+    df.columns = df.columns.str.strip()
+    return _apply_categories(df)
+
+
+def _convert_cell(cell):
+    """和 pandas 读 Excel 时一样转换单元格：空 -> ""，错误值 -> NaN，整数值的数字 -> int"""
+    value = cell.value
+    if value is None:
+        return ""
+    if cell.data_type == 'e':
+        return np.nan
+    if cell.data_type == 'n':
+        as_int = int(value)
+        return as_int if as_int == value else float(value)
+    return value
+
+
+def iter_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """
+    用 openpyxl 只读模式逐行读取第一个工作表，每 chunk_size 行 yield 一个 DataFrame。
+    每块都交给 pandas 读 Excel 时用的同一个 TextParser（按 SCHEMA 指定类型），空值、数字识别和整表读入一致；
+    表尾的空行和整表读入一样丢掉；只有表头没有数据时 yield 一个只有列名的空 DataFrame。
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows = sheet.rows
+
+        header = [_convert_cell(cell) for cell in next(rows, ())]
+        while header and header[-1] == "":
+            header.pop()
+        if not header:
+            return
+        # 表头也交给 TextParser，空表头、重名列的命名和整表读入一样（Unnamed: 3、金额.1 ...）
+        columns = TextParser([header], header=0, skip_blank_lines=False).read().columns
+        width = len(columns)
+
+        chunk, blanks = [], []
+        yielded = False
+        for row in rows:
+            values = [_convert_cell(cell) for cell in row][:width]
+            values += [""] * (width - len(values))
+            if all(v == "" for v in values):
+                # 中间的空行保留，表尾的空行丢掉：先攒着，后面还有数据再放回去
+                blanks.append(values)
+                continue
+            chunk.extend(blanks)
+            blanks = []
+            chunk.append(values)
+            if len(chunk) >= chunk_size:
+                yield _parse_chunk(chunk, columns)
+                chunk, yielded = [], True
+        if chunk or not yielded:
+            # 没有数据行也要给出列名，输出表和整表模式一样带表头
+            yield _parse_chunk(chunk, columns)
+    finally:
+        workbook.close()
+
+
+def _parse_chunk(rows, columns):
+    df = TextParser(rows, names=list(columns), header=None, skip_blank_lines=False,
+                    dtype=_read_dtypes(columns)).read()
+    df.columns = df.columns.str.strip()
+    return _apply_categories(df)
+
+
+def output_path_for(file_path):
+    folder, name = os.path.split(file_path)
+    return os.path.join(folder, OUTPUT_PREFIX + name)
+
+
+def process_data(file_path, chunk_size=None, use_cache=True):
+    """
+    校验并格式化 file_path，结果写到同目录下的 处理结果_<文件名>。
+    chunk_size 不为空时走流式模式（不用解析缓存，缓存要把整表放进内存）；use_cache=False 时总是重新解析 Excel。
+    成功返回 {"file", "output", "passed", "failed"}，读取或保存失败返回 None。
+    """
+    if chunk_size:
+        return process_data_streaming(file_path, chunk_size)
 
-def process_data(file_path):
     print(f"正在读取文件: {file_path} ...")
     
     try:
         # 读取 Excel 文件
-        df = pd.read_excel(file_path)
-        
-        # 1. 清洗表头：去除表头可能存在的空格，防止 '消费日期 ' 这种匹配不到的情况
-        df.columns = df.columns.str.strip()
+        df = read_input(file_path, use_cache=use_cache)
         print(f"成功读取，包含列名: {list(df.columns)}")
         
     except Exception as e:
         print(f"读取文件失败: {e}")
         return
 
-    # --- 配置区域 ---
-    # 根据你的截图，示例产品为"其他"，我已将其加入列表。
-    # 请在此处补全所有合规的9个产品名称
-    VALID_PRODUCTS = [
-        "其他", "保妥适单次", "乔雅登", "酷塑", "标签5", 
-        "标签6", "标签7", "标签8", "标签9"
-    ]
-    
-    # --- 校验逻辑函数 ---
-    def validate_row(row):
-        errors = []
-        
-        # 1. 消费日期 (必填, 格式转换)
-        # 你的源数据带时间(18:46:31)，这里主要检查能否转换为日期
-        date_val = row.get('消费日期')
-        if pd.isna(date_val):
-            errors.append("消费日期为空")
-        else:
-            try:
-                pd.to_datetime(date_val)
-            except:
-                errors.append("消费日期格式错误")
-
-        # 2. 业绩金额 (非必填, 范围检查)
-        amount = row.get('业绩金额')
-        if not pd.isna(amount):
-            try:
-                amt_num = float(amount)
-                if not (-1000000 <= amt_num <= 1000000):
-                    errors.append("业绩金额超出范围 (-100万 到 +100万)")
-            except ValueError:
-                errors.append("业绩金额必须是数字")
-
-        # 3. 客户卡号 (必填, 长度<=50)
-        # 注意：Excel读取长数字可能会变成科学计数法或数字类型，需强制转字符串
-        card_no = str(row.get('客户卡号', ''))
-        # 如果是 NaN 或者转成字符串是 'nan'
-        if pd.isna(row.get('客户卡号')) or card_no.lower() == 'nan' or card_no.strip() == '':
-            errors.append("客户卡号为空")
-        elif len(card_no) > 50:
-            errors.append(f"客户卡号长度超过50位")
-
-        # 4. 渠道来源 (非必填, 长度<=50)
-        source = row.get('渠道来源')
-        if not pd.isna(source):
-            if len(str(source)) > 50:
-                errors.append("渠道来源长度超过50位")
-
-        # 5. 咨询师 (非必填, 长度<=10)
-        consultant = row.get('咨询师')
-        if not pd.isna(consultant):
-            if len(str(consultant)) > 10:
-                errors.append("咨询师名称长度超过10位")
-
-        # 6. 消费产品 (必填, 必须在白名单内)
-        product = row.get('消费产品')
-        if pd.isna(product) or str(product).strip() == '':
-            errors.append("消费产品为空")
-        elif str(product).strip() not in VALID_PRODUCTS:
-            errors.append(f"产品名称不合规")
-
-        return "; ".join(errors)
-
     # --- 执行校验 ---
     print("正在校验数据...")
-    df['数据校验结果'] = df.apply(validate_row, axis=1)
+    parsed = parse_values(df)
+    codes = validate_codes(df, parsed)
+    df['数据校验结果'] = render_errors(codes, df.index)
 
     # --- 数据清洗与格式化 (Formatting) ---
-    
-    # 1. 日期格式化：无论原数据是 "2025-11-30 18:46:31" 还是其他，统一转为 "yyyy/mm/dd"
-    # errors='coerce' 会把无法转换的变成 NaT，避免报错
-    df['消费日期'] = pd.to_datetime(df['消费日期'], errors='coerce').dt.strftime('%Y/%m/%d')
-    
-    # 2. 金额格式化：保留两位小数
-    df['业绩金额'] = pd.to_numeric(df['业绩金额'], errors='coerce').round(2)
-
-    # 3. 客户卡号：防止变成 2.50822E+11 这种形式，去掉 .0
-    def format_card(x):
-        if pd.isna(x): return ""
-        s = str(x)
-        if s.endswith('.0'): return s[:-2]
-        return s
-    df['客户卡号'] = df['客户卡号'].apply(format_card)
+    format_frame(df, parsed)
 
     # --- 输出统计 ---
-    valid_count = len(df[df['数据校验结果'] == ""])
-    invalid_count = len(df) - valid_count
+    invalid_count = int(np.count_nonzero(codes))
+    valid_count = len(df) - invalid_count
     print(f"校验完成: 通过 {valid_count} 行, 失败 {invalid_count} 行")
 
     # --- 保存结果 ---
-    output_filename = '处理结果_a.xlsx'
+    # 没通过的行整行标红，另有“错误明细”和“规则统计”两张表（见 result_writer）
+    output_filename = output_path_for(file_path)
     
     try:
-        with pd.ExcelWriter(output_filename, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='处理结果')
-            
-            workbook = writer.book
-            worksheet = writer.sheets['处理结果']
-            
-            # 设置列宽，方便阅读
-            worksheet.set_column('A:A', 15) # 消费日期
-            worksheet.set_column('B:B', 12) # 业绩金额
-            worksheet.set_column('C:C', 20) # 客户卡号
-            worksheet.set_column('G:G', 40) # 校验结果列(假设在G列)
-
-            # 标记错误的行：如果有错误，最后一列标红
-            red_format = workbook.add_format({'bg_color': '#FFC7CE', 'font_color': '#9C0006'})
-            # 如果想让最后一列文字变红，ExcelWriter需要更复杂的条件格式，
-            # 这里我们简单一点：告诉用户直接看最后一列。
-
+        with _open_writer(output_filename) as writer:
+            writer.write(df, codes)
         print(f"处理完毕！结果已保存至: {output_filename}")
         
     except Exception as e:
         print(f"保存文件失败，请检查文件是否被占用: {e}")
+        return None
+
+    return {"file": file_path, "output": output_filename, "passed": valid_count, "failed": invalid_count}
+
+
+def _open_writer(output_filename):
+    writer = ResultWriter(output_filename, ERROR_MESSAGES, sheet_name=SHEET_NAME)
+    writer.set_column_widths(COLUMN_WIDTHS)
+    return writer
+
+
+# --- 流式模式 ---
+# 年底的合并导出有上百万行，整表读进来再加上中间的几份拷贝，小内存的机器会开始用交换分区。
+# 流式模式一次只读 chunk_size 行：校验、格式化后马上交给 ResultWriter 写出，再读下一块。
+# 输出读回来和整表模式的结果相同。
+
+def process_data_streaming(file_path, chunk_size=CHUNK_SIZE):
+    print(f"正在流式读取文件: {file_path}（每块 {chunk_size} 行）...")
+    output_filename = output_path_for(file_path)
+    writer = _open_writer(output_filename)
+
+    try:
+        for df in iter_chunks(file_path, chunk_size):
+            if writer.columns is None:
+                print(f"成功读取，包含列名: {list(df.columns)}")
+
+            parsed = parse_values(df)
+            codes = validate_codes(df, parsed)
+            df['数据校验结果'] = render_errors(codes, df.index)
+            format_frame(df, parsed)
+
+            writer.write(df, codes)
+            print(f"  已处理 {writer.rows} 行...")
+    except Exception as e:
+        print(f"处理失败: {e}")
+        try:
+            writer.close()
+        except Exception as close_error:
+            print(f"⚠️ 关闭输出文件失败: {close_error}")
+        return None
+
+    valid_count = writer.rows - writer.failed
+    invalid_count = writer.failed
+    print(f"校验完成: 通过 {valid_count} 行, 失败 {invalid_count} 行")
+    try:
+        writer.close()
+        print(f"处理完毕！结果已保存至: {output_filename}")
+    except Exception as e:
+        print(f"保存文件失败，请检查文件是否被占用: {e}")
+        return None
+
+    return {"file": file_path, "output": output_filename, "passed": valid_count, "failed": invalid_count}
+
+
+# --- 批量模式 ---
+# 每个月有几十个门店的导出文件。批量模式接受一个目录或通配符，用进程池并行处理
+# （校验和格式化主要是 CPU，多进程才能用上多个核），每个文件的结果写在它旁边，
+# 最后把各文件的通过/失败行数汇总到一张表里。
+
+def find_inputs(target):
+    """目录 -> 里面的 .xlsx；否则按通配符展开。跳过已经是处理结果的文件和 Excel 的 ~$ 锁文件"""
+    if os.path.isdir(target):
+        pattern = os.path.join(target, '*.xlsx')
+    else:
+        pattern = target
+    files = []
+    for path in sorted(glob.glob(pattern)):
+        name = os.path.basename(path)
+        if name.startswith((OUTPUT_PREFIX, '~$')) or name == SUMMARY_FILENAME or not os.path.isfile(path):
+            continue
+        files.append(path)
+    return files
+
+
+def _process_one(file_path, chunk_size, use_cache):
+    """进程池里跑的单个文件；出错也返回一行汇总，不影响其他文件"""
+    try:
+        result = process_data(file_path, chunk_size=chunk_size, use_cache=use_cache)
+    except Exception as e:
+        return {"file": file_path, "error": str(e)}
+    if result is None:
+        return {"file": file_path, "error": "读取或保存失败"}
+    return result
+
+
+def process_batch(target, workers=None, chunk_size=None, use_cache=True, summary_path=None):
+    """并行处理 target（目录或通配符）下的所有文件，返回每个文件的汇总并写出汇总表"""
+    files = find_inputs(target)
+    if not files:
+        print(f"没有找到要处理的文件: {target}")
+        return []
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+    print(f"共 {len(files)} 个文件，{workers} 个进程并行处理...")
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_process_one, f, chunk_size, use_cache) for f in files]
+        for future in as_completed(futures):
+            results.append(future.result())
+    results.sort(key=lambda r: r["file"])
+
+    if summary_path is None:
+        folder = target if os.path.isdir(target) else os.path.dirname(files[0])
+        summary_path = os.path.join(folder, SUMMARY_FILENAME)
+    write_summary(results, summary_path)
+    return results
+
+
+def write_summary(results, summary_path):
+    summary = pd.DataFrame([{
+        '文件': os.path.basename(r["file"]),
+        '总行数': r.get("passed", 0) + r.get("failed", 0),
+        '通过': r.get("passed", 0),
+        '失败': r.get("failed", 0),
+        '结果文件': os.path.basename(r.get("output", "")),
+        '错误': r.get("error", ""),
+    } for r in results])
+    totals = summary[['总行数', '通过', '失败']].sum()
+
+    print("\n---- 批量处理汇总 ----")
+    print(summary.to_string(index=False))
+    print(f"合计: {int(totals['总行数'])} 行，通过 {int(totals['通过'])}，失败 {int(totals['失败'])}，"
+          f"{int((summary['错误'] != '').sum())} 个文件出错")
+
+    total_row = pd.DataFrame([{'文件': '合计', **totals.to_dict(), '结果文件': '', '错误': ''}])
+    try:
+        pd.concat([summary, total_row], ignore_index=True).to_excel(summary_path, index=False)
+        print(f"汇总已保存至: {summary_path}")
+    except Exception as e:
+        print(f"保存汇总失败: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校验并格式化消费记录 Excel")
+    parser.add_argument("file", nargs="?", default="a.xlsx",
+                        help="要处理的 Excel 文件（默认 a.xlsx）；给目录或通配符（如 'exports/*.xlsx'）时批量处理")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="批量模式的并行进程数（默认 CPU 核数）")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式模式：分块读取、校验、写出，内存占用和文件大小无关")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help=f"流式模式每块的行数（默认 {CHUNK_SIZE}）")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="不读也不写解析缓存，总是重新解析 Excel")
+    args = parser.parse_args()
+    chunk_size = args.chunk_size if args.stream else None
+    if os.path.isfile(args.file):
+        process_data(args.file, chunk_size=chunk_size, use_cache=not args.no_cache)
+    else:
+        process_batch(args.file, workers=args.workers, chunk_size=chunk_size, use_cache=not args.no_cache)
+
 
 if __name__ == "__main__":
     # 请确保你的文件名为 a.xlsx
-    process_data('a.xlsx')
\ No newline at end of file
+    main()
@@ -0,0 +1,127 @@
+import hashlib
+import os
+
+import pandas as pd
+
+# --- 解析结果缓存 ---
+# 用 openpyxl 解析 xlsx 是 process_data 里最慢的一步，而改了 VALID_PRODUCTS 或长度限制后
+# 经常要对同一个 a.xlsx 再跑一遍。这里把解析好、表头已清洗的 DataFrame 存成二进制文件，
+# 键是源文件内容的 sha256 + 工作表 + pandas 版本（+ 调用方给的 variant，比如读入时的列类型），
+# 文件没变就直接读缓存，不再解析 Excel。
+#   - 装了 pyarrow 时存 parquet（按列存储）；没装，或者有混合类型的列（parquet 存不了）时存 pickle。
+#     category / str 列两种格式都能原样存取。
+#   - 缓存目录超过 max_bytes 时按最近使用时间删掉最旧的文件。
+#   - 文件损坏或版本不对就当没有缓存，重新解析。
+
+CACHE_DIR = ".parse_cache"
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def file_digest(path, block_size=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_key(path, sheet=0, variant="") -> str:
+    raw = f"{file_digest(path)}|{sheet}|{pd.__version__}|{variant}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cached_read(path, parse, sheet=0, variant="", cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """
+    有缓存就读缓存，没有就调 parse() 解析并存进缓存。
+    parse: 不带参数、返回 DataFrame 的函数（解析 path 的 sheet 这个工作表）。
+    variant: 解析方式变了（比如列类型）时换一个值，旧缓存就不会被用到。
+    """
+    key = cache_key(path, sheet, variant)
+    df = _load(cache_dir, key)
+    if df is not None:
+        print(f"使用解析缓存（{path} 未变化），跳过 Excel 解析")
+        return df
+
+    df = parse()
+    try:
+        _store(cache_dir, key, df)
+        evict(cache_dir, max_bytes)
+    except OSError as e:
+        print(f"⚠️ 解析缓存保存失败（不影响本次运行）: {e}")
+    return df
+
+
+def _load(cache_dir, key):
+    for ext, reader in ((".parquet", pd.read_parquet), (".pkl", pd.read_pickle)):
+        cache_path = os.path.join(cache_dir, key + ext)
+        if not os.path.exists(cache_path):
+            continue
+        if ext == ".parquet" and not HAS_PYARROW:
+            continue
+        try:
+            df = reader(cache_path)
+            os.utime(cache_path)  # 记录最近使用时间，清理时按它排序
+        except FileNotFoundError:  # 刚好被其他进程清理掉
+            return None
+        except Exception as e:
+            print(f"⚠️ 解析缓存损坏，重新解析: {e}")
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            return None
+        return df
+    return None
+
+
+def _parquet_safe(df) -> bool:
+    # object 列（以及类别里混着文字和数字的 category 列）parquet 存不了或者读回来类型会变
+    if not HAS_PYARROW:
+        return False
+    for dtype in df.dtypes:
+        if dtype == object:
+            return False
+        if isinstance(dtype, pd.CategoricalDtype) and dtype.categories.dtype == object:
+            return False
+    return True
+
+
+def _store(cache_dir, key, df):
+    os.makedirs(cache_dir, exist_ok=True)
+    if _parquet_safe(df):
+        ext, write = ".parquet", df.to_parquet
+    else:
+        ext, write = ".pkl", df.to_pickle
+    cache_path = os.path.join(cache_dir, key + ext)
+    # 批量模式下多个进程可能同时写缓存，临时文件带上进程号
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, cache_path)
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """缓存目录总大小超过 max_bytes 时，从最久没用的文件开始删"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith((".parquet", ".pkl")):
+            continue
+        full = os.path.join(cache_dir, name)
+        try:
+            st = os.stat(full)
+        except FileNotFoundError:  # 其他进程刚删掉
+            continue
+        entries.append((st.st_mtime, st.st_size, full))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, full in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(full)
+        except FileNotFoundError:
+            pass
+        total -= size
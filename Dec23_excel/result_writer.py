@@ -0,0 +1,158 @@
+import numpy as np
+import xlsxwriter
+from xlsxwriter.utility import xl_col_to_name
+
+# --- 结果写出 ---
+# 原来用 pd.ExcelWriter 把整张“处理结果”先在内存里拼好再写，行数上百万时又慢又占内存；
+# 定义了 red_format 却从来没用上，审核的人只能一行行盯着最后一列看。
+# ResultWriter 用 xlsxwriter 的 constant_memory 模式逐行写出（写完一行就落到临时文件），
+# 整表模式和流式模式共用，内存和单行写出的耗时都不随行数增长：
+#   - 处理结果：全部行，整个数据区域只加一条条件格式，校验结果不为空的整行标红；
+#   - 错误明细：只有没通过的行，第一列是它在“处理结果”里的行号；
+#   - 规则统计：每条校验规则各有多少行没通过（由每行的错误位掩码统计，不用再拆文字）。
+# 单元格类型和格式跟 pandas 写 Excel 时一致（表头加粗加框，日期时间 YYYY-MM-DD HH:MM:SS）。
+# 一张工作表最多 1048576 行（含表头），写满后接着写到 处理结果_2（配套 错误明细_2，原行号指的是
+# 同编号的处理结果表里的行），以此类推；xlsxwriter 超出范围时不报错只返回 -1，这里检查后直接报错，
+# 不会悄悄丢行。
+
+RESULT_COLUMN = '数据校验结果'
+ERRORS_SHEET = '错误明细'
+TALLY_SHEET = '规则统计'
+
+# 每张工作表最多能放的数据行数（Excel 上限 1048576 行，减去表头）
+MAX_SHEET_ROWS = 1048575
+
+# pandas 写表头用的样式
+_HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+_RED_FORMAT = {'bg_color': '#FFC7CE', 'font_color': '#9C0006'}
+
+
+def _cells(df):
+    """DataFrame -> 可以直接 write_row 的行：空值变成 None（xlsxwriter 不接受 NaN）"""
+    values = df.astype(object)
+    return values.where(df.notna(), None).itertuples(index=False, name=None)
+
+
+class ResultWriter:
+    """按块写出校验结果；rules 是 {错误位: 规则说明}，用来出规则统计"""
+
+    def __init__(self, path, rules, sheet_name='处理结果'):
+        self.path = path
+        self.rules = rules
+        self.sheet_name = sheet_name
+        self.workbook = xlsxwriter.Workbook(path, {
+            'constant_memory': True,
+            'default_date_format': 'YYYY-MM-DD HH:MM:SS',
+        })
+        self.header_format = self.workbook.add_format(_HEADER_FORMAT)
+        self.red_format = self.workbook.add_format(_RED_FORMAT)
+
+        self.columns = None
+        self.widths = {}
+        self.rows = 0      # 已写出的数据行数（不含表头，所有处理结果表合计）
+        self.failed = 0
+        self.tally = {bit: 0 for bit in rules}
+        self.pages = []    # [(处理结果表, 数据行数)]，关闭时给每张表加条件格式
+        self._add_page()
+
+    def set_column_widths(self, widths):
+        """widths: {'A:A': 15, ...}，作用在处理结果表上（包括写满后新开的表）"""
+        self.widths = dict(widths)
+        self._set_widths(self.sheet)
+
+    def _set_widths(self, sheet):
+        for cols, width in self.widths.items():
+            sheet.set_column(cols, width)
+
+    def _add_page(self):
+        """新开一对 处理结果 / 错误明细 表（第一对不带编号）"""
+        suffix = f'_{len(self.pages) + 1}' if self.pages else ''
+        self.sheet = self.workbook.add_worksheet(self.sheet_name + suffix)
+        self.errors_sheet = self.workbook.add_worksheet(ERRORS_SHEET + suffix)
+        self._set_widths(self.sheet)
+        self.pages.append((self.sheet, 0))
+        self._sheet_rows = 0
+        self._errors_row = 1
+        if self.columns is not None:
+            self._write_headers()
+
+    def _write_headers(self):
+        self._write_row(self.sheet, 0, self.columns, self.header_format)
+        self._write_row(self.errors_sheet, 0, ['原行号', *self.columns], self.header_format)
+        self.errors_sheet.set_column(0, 0, 8)
+        self.errors_sheet.set_column(len(self.columns), len(self.columns), 40)
+
+    @staticmethod
+    def _write_row(sheet, row, values, cell_format=None):
+        # 超出工作表范围（行、列）时 xlsxwriter 只返回 -1，不报错
+        if sheet.write_row(row, 0, values, cell_format) == -1:
+            raise ValueError(f"无法写入工作表 {sheet.name} 第 {row + 1} 行（超出 Excel 的行列上限）")
+
+    def write(self, df, codes):
+        """写出一块：df 已经格式化好、最后一列是数据校验结果；codes 是每行的错误位掩码"""
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self._write_headers()
+
+        codes = np.asarray(codes)
+        failed = codes != 0
+        pos = 0
+        while pos < len(df):
+            if self._sheet_rows >= MAX_SHEET_ROWS:
+                self._add_page()
+            take = min(len(df) - pos, MAX_SHEET_ROWS - self._sheet_rows)
+            self._write_part(df.iloc[pos:pos + take], failed[pos:pos + take])
+            pos += take
+
+        if failed.any():
+            for bit in self.tally:
+                self.tally[bit] += int(np.count_nonzero(codes & bit))
+        self.failed += int(failed.sum())
+
+    def _write_part(self, df, failed):
+        """写到当前这张处理结果表（调用方保证放得下）"""
+        start = self._sheet_rows + 1
+        for offset, values in enumerate(_cells(df)):
+            self._write_row(self.sheet, start + offset, values)
+
+        if failed.any():
+            # 行号按 Excel 的显示（从 1 开始，第 1 行是表头）
+            sheet_rows = start + np.flatnonzero(failed) + 1
+            for row_no, values in zip(sheet_rows.tolist(), _cells(df[failed])):
+                self._write_row(self.errors_sheet, self._errors_row, (row_no, *values))
+                self._errors_row += 1
+
+        self._sheet_rows += len(df)
+        self.pages[-1] = (self.sheet, self._sheet_rows)
+        self.rows += len(df)
+
+    def close(self):
+        if self.columns is not None:
+            # 每张表一条条件格式覆盖整个数据区域：这一行的校验结果不为空就整行标红
+            result_col = xl_col_to_name(self.columns.index(RESULT_COLUMN))
+            last_col = xl_col_to_name(len(self.columns) - 1)
+            for sheet, rows in self.pages:
+                if not rows:
+                    continue
+                sheet.conditional_format(f'A2:{last_col}{rows + 1}', {
+                    'type': 'formula',
+                    'criteria': f'=${result_col}2<>""',
+                    'format': self.red_format,
+                })
+
+        # 规则统计放在最后（处理结果表写满后新开的表排在它前面）
+        tally_sheet = self.workbook.add_worksheet(TALLY_SHEET)
+        tally_sheet.write_row(0, 0, ['校验规则', '失败行数'], self.header_format)
+        tally_sheet.set_column(0, 0, 40)
+        row = 1
+        for bit, message in self.rules.items():
+            tally_sheet.write_row(row, 0, (message, self.tally[bit]))
+            row += 1
+        tally_sheet.write_row(row, 0, ('失败行合计', self.failed))
+        self.workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()